@@ -0,0 +1,243 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+from serp_core import build_params, compare_urls, ngram_analysis, parse_serp, serp_similarity
+from serp_replay import StandinServer, synthetic_serp
+
+# Offline benchmarks: SERPs come from the deterministic synthetic generator or the
+# local stand-in server, so numbers only move when the code (or machine) does.
+
+DEFAULT_SCALES = "2,1000,100000"
+KEYWORDS_PER_TOPIC = 20
+
+
+def make_keywords(count):
+    # "topic12 keyword345"-style keywords; keywords of one topic share most URLs
+    topics = max(1, count // KEYWORDS_PER_TOPIC)
+    return [f"topic{i % topics} keyword{i}" for i in range(count)]
+
+
+def make_serps(keywords, depth=10):
+    from serp_record import UrlTable
+
+    table = UrlTable()
+    serps = {}
+    for keyword in keywords:
+        params = build_params(keyword, "", "google.com", "en", "Desktop")
+        serps[keyword] = parse_serp(synthetic_serp(params), depth, table)
+    return serps
+
+
+def keyword_pairs(keywords, limit):
+    # Neighbouring keywords, which mostly share a topic, up to limit pairs
+    pairs = list(zip(keywords[::2], keywords[1::2]))[:limit]
+    return pairs or [(keywords[0], keywords[0])]
+
+
+def measure(run, repeat):
+    timings = []
+    items = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = run()
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    return {
+        "items": items,
+        "min_s": round(best, 6),
+        "median_s": round(statistics.median(timings), 6),
+        "items_per_s": round(items / best, 1) if best else None,
+    }
+
+
+def bench_fetch(keywords, args):
+    from serp_bulk import fetch_keyword_serps
+    from serp_fetch import SerpFetcher
+
+    keywords = keywords[:args.fetch_limit]
+    with StandinServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                       seed=args.seed) as server:
+        # No cache: every repeat goes over the wire to the stand-in
+        fetcher = SerpFetcher(max_workers=args.workers, backoff=0.01, base_url=server.url)
+
+        def run():
+            serps = fetch_keyword_serps(keywords, "bench", "google.com", "en", "Desktop", fetcher)
+            return len(serps)
+
+        result = measure(run, args.repeat)
+        result["requests"] = server.requests
+        result["injected_errors"] = server.errors
+        fetcher.close()
+    return result
+
+
+def bench_similarity(serps, args):
+    from serp_bulk import pairwise_similarity
+
+    if len(serps) == 2:
+        urls1, urls2 = (serp.urls for serp in serps.values())
+
+        def run():
+            serp_similarity(urls1, urls2)
+            return 1
+
+        return measure(run, args.repeat)
+    # Every pair at or above the threshold, from the sparse overlap matrix
+    return measure(lambda: sum(1 for _ in pairwise_similarity(serps, args.min_similarity)), args.repeat)
+
+
+def bench_similarity_lsh(serps, args):
+    from serp_bulk import pairwise_similarity
+
+    return measure(lambda: sum(1 for _ in pairwise_similarity(serps, args.min_similarity, approximate=True)),
+                   args.repeat)
+
+
+def bench_similarity_sharded(serps, args):
+    from serp_shard import sharded_pairs
+
+    # Pool start-up is part of the time, as it is for a real batch
+    records = list(serps.values())
+    return measure(lambda: sum(1 for _ in sharded_pairs(records, args.min_similarity, workers=args.processes)),
+                   args.repeat)
+
+
+def bench_domains(serps, pairs, args):
+    from serp_domains import common_domains, registrable_domain
+
+    def run():
+        # Cold domain cache on every repeat so the parse cost is always included
+        registrable_domain.cache_clear()
+        for keyword1, keyword2 in pairs:
+            common_domains(serps[keyword1].urls, serps[keyword2].urls)
+        return len(pairs)
+
+    return measure(run, args.repeat)
+
+
+def bench_ngrams(serps, args):
+    titles = [title for serp in serps.values() for title in serp.titles]
+    top_k = None if len(serps) <= 1000 else 1000
+
+    def run():
+        ngram_analysis(titles, top_k=top_k)
+        return len(titles)
+
+    return measure(run, args.repeat)
+
+
+def bench_render(serps, pairs, args):
+    from serp_render import render_comparison
+
+    inputs = []
+    for keyword1, keyword2 in pairs:
+        serp1, serp2 = serps[keyword1], serps[keyword2]
+        comparison = compare_urls(serp1.urls, serp2.urls)
+        ngrams = ngram_analysis(serp1.titles + serp2.titles)
+        inputs.append((keyword1, keyword2, serp1.urls, serp2.urls, comparison, ngrams))
+
+    def run():
+        for item in inputs:
+            render_comparison(*item)
+        return len(inputs)
+
+    return measure(run, args.repeat)
+
+
+def run_benchmarks(args):
+    scales = [int(scale) for scale in args.scales.split(",")]
+    selected = set(args.only.split(",")) if args.only else None
+    results = []
+
+    def record(name, scale, run):
+        if selected is not None and name not in selected:
+            return
+        result = run()
+        result = dict(benchmark=name, keywords=scale, **result)
+        results.append(result)
+        print(f"{name:>18} {scale:>7} keywords  {result['min_s']:>10.4f}s  {result['items']:>9} items",
+              file=sys.stderr)
+
+    for scale in scales:
+        keywords = make_keywords(scale)
+        serps = make_serps(keywords)
+        pairs = keyword_pairs(keywords, args.pair_limit)
+        record("fetch", scale, lambda: bench_fetch(keywords, args))
+        record("similarity", scale, lambda: bench_similarity(serps, args))
+        if scale > 2:
+            record("similarity_lsh", scale, lambda: bench_similarity_lsh(serps, args))
+            record("similarity_sharded", scale, lambda: bench_similarity_sharded(serps, args))
+        record("domains", scale, lambda: bench_domains(serps, pairs, args))
+        record("ngrams", scale, lambda: bench_ngrams(serps, args))
+        record("render", scale, lambda: bench_render(serps, pairs, args))
+    return results
+
+
+def environment():
+    import numpy
+    import scipy
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "scipy": scipy.__version__,
+    }
+
+
+def compare_baseline(results, path):
+    # Ratio of this run's best time to the baseline's, per benchmark and scale
+    with open(path, encoding="utf-8") as f:
+        baseline = {(row["benchmark"], row["keywords"]): row for row in json.load(f)["results"]}
+    for row in results:
+        previous = baseline.get((row["benchmark"], row["keywords"]))
+        if previous and previous["min_s"]:
+            row["vs_baseline"] = round(row["min_s"] / previous["min_s"], 3)
+            print(f"{row['benchmark']:>18} {row['keywords']:>7} keywords  x{row['vs_baseline']:.3f} vs baseline",
+                  file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks of fetching, similarity, domains, n-grams "
+                                                 "and rendering; writes JSON results.")
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help="Comma-separated keyword counts")
+    parser.add_argument("--only", help="Comma-separated benchmark names to run")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark; the best time is reported")
+    parser.add_argument("--min-similarity", type=float, default=30)
+    parser.add_argument("--pair-limit", type=int, default=10000, help="Pairs used by the domain and render benchmarks")
+    parser.add_argument("--fetch-limit", type=int, default=10000, help="Keywords fetched from the stand-in per scale")
+    parser.add_argument("--workers", type=int, default=20)
+    parser.add_argument("--processes", type=int, help="Pool size for the sharded benchmark (default: CPU count)")
+    parser.add_argument("--latency", type=float, default=0.01, help="Stand-in seconds per response")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.01, help="Share of stand-in responses that fail")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("-o", "--output", help="Results file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args)
+    if args.baseline:
+        compare_baseline(results, args.baseline)
+    report = {
+        "environment": environment(),
+        "settings": {name: value for name, value in vars(args).items() if name not in ("output", "baseline")},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
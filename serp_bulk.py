@@ -0,0 +1,220 @@
+import argparse
+import csv
+import itertools
+import os
+import sys
+
+from serp_core import build_page_params, parse_serp, fetch_paged_serps, ngram_analysis, SERP_DEPTHS
+from serp_export import COMPARISON_COLUMNS, DEFAULT_EXPORT_FORMAT, EXPORT_FORMATS, detailed_rows, write_rows
+
+BULK_COLUMNS = ["keyword1", "keyword2", "similarity", "exact_matches"]
+# Keywords fetched per batch; only one batch of raw payloads is alive at a time
+FETCH_CHUNK_SIZE = 1000
+# Above this many keywords the app only lists every pair (min similarity 0) in a
+# background job, which streams rows to disk; 500 keywords are already 124,750 pairs
+MAX_ALL_PAIRS_KEYWORDS = int(os.environ.get("SERP_BULK_MAX_ALL_PAIRS", 500))
+
+
+def read_keywords(lines):
+    # Accepts a bare list or a CSV whose "keyword"/"keywords" column holds the terms
+    rows = [row for row in csv.reader(lines) if row and row[0].strip()]
+    if not rows:
+        return []
+    header = [cell.strip().lower() for cell in rows[0]]
+    column = 0
+    for name in ("keyword", "keywords"):
+        if name in header:
+            column = header.index(name)
+            rows = rows[1:]
+            break
+    return [row[column] for row in rows if len(row) > column]
+
+
+def read_keyword_file(path):
+    # read_keywords on a file, or on stdin for "-"; shared by the command line tools
+    if path == "-":
+        return read_keywords(sys.stdin)
+    with open(path, newline="", encoding="utf-8") as f:
+        return read_keywords(f)
+
+
+def dedupe_keywords(keywords):
+    seen = set()
+    unique = []
+    for keyword in keywords:
+        keyword = " ".join(keyword.split())
+        if keyword and keyword.lower() not in seen:
+            seen.add(keyword.lower())
+            unique.append(keyword)
+    return unique
+
+
+def fetch_keyword_serps(keywords, api_key, search_engine, language, device, fetcher=None, force_refresh=False,
+                        depth=10):
+    from serp_record import UrlTable
+
+    keywords = dedupe_keywords(keywords)
+    # One URL table for the batch, dropped with its records
+    table = UrlTable()
+    page_groups = [build_page_params(keyword, api_key, search_engine, language, device, depth) for keyword in keywords]
+    serps = {}
+    # Every distinct keyword is fetched exactly once, pairs reuse the compact records
+    for start in range(0, len(keywords), FETCH_CHUNK_SIZE):
+        chunk = slice(start, start + FETCH_CHUNK_SIZE)
+        for keyword, results in zip(keywords[chunk], fetch_paged_serps(page_groups[chunk], fetcher, force_refresh)):
+            serps[keyword] = parse_serp(results, depth, table)
+    return serps
+
+
+def approximate_pairs(url_lists, min_similarity, target_recall=0.95):
+    # MinHash/LSH proposes candidates, one sparse pass over them confirms the exact scores
+    import numpy as np
+    from serp_lsh import build_index
+    from serp_matrix import score_pairs
+
+    index = build_index(url_lists, min_similarity, target_recall=target_recall)
+    # Empty SERPs aren't indexed, so index rows map back to list positions through keys
+    keys = np.asarray(index.keys, dtype=np.int64)
+    firsts, seconds = index.candidate_rows()
+    yield from score_pairs(url_lists, keys[firsts], keys[seconds], min_similarity)
+
+
+def log_recall(serps, min_similarity, target_recall=0.95, file=None):
+    # What --approximate should find (from the banding) next to what it does find
+    # on a sample of these SERPs, checked against exact scores
+    from serp_lsh import sampled_recall_report
+
+    report = sampled_recall_report([serp.urls for serp in serps.values()], min_similarity,
+                                   target_recall=target_recall)
+    print(f"LSH: {report['bands']} bands x {report['rows']} rows at {min_similarity}% similarity, expected recall "
+          f"{report['expected_recall']:.2%}, measured {report['recall']:.2%} on {report['exact_pairs']} pairs of "
+          f"{report['keywords']} sampled keywords", file=file or sys.stderr)
+    return report
+
+
+def pairwise_similarity(serps, min_similarity=0, rank_weighted=False, approximate=False, target_recall=0.95,
+                        workers=None):
+    from serp_matrix import similar_pairs
+    from serp_shard import sharded_pairs, use_pool
+
+    keywords = list(serps)
+    if approximate and min_similarity > 0 and not rank_weighted:
+        pairs = approximate_pairs([serps[keyword].urls for keyword in keywords], min_similarity, target_recall)
+    elif use_pool(len(keywords), workers):
+        # Large batches are scored in row blocks across a process pool
+        pairs = sharded_pairs([serps[keyword] for keyword in keywords], min_similarity, rank_weighted, workers)
+    else:
+        pairs = similar_pairs([serps[keyword].urls for keyword in keywords], min_similarity, rank_weighted)
+    if min_similarity <= 0:
+        pairs = with_unshared_pairs(pairs, len(keywords))
+    for i, j, similarity, shared in pairs:
+        yield {"keyword1": keywords[i], "keyword2": keywords[j], "similarity": similarity, "exact_matches": shared}
+
+
+def with_unshared_pairs(pairs, count):
+    # Every pair of `count` keywords in (i, j) order: scored pairs, which come in
+    # that order, pass through and the pairs with nothing in common are filled
+    # in as zeros, so all N² rows stream out without a table of them in memory
+    pairs = iter(pairs)
+    scored = next(pairs, None)
+    for i, j in itertools.combinations(range(count), 2):
+        if scored is not None and scored[0] == i and scored[1] == j:
+            yield scored
+            scored = next(pairs, None)
+        else:
+            yield i, j, 0, 0
+
+
+def detailed_pair_rows(serps, pairs, workers=None):
+    # Full comparison rows for scored pairs; per-pair domain matching and n-grams
+    # go to the process pool for large lists
+    from serp_shard import sharded_detailed_rows, use_pool
+
+    if use_pool(len(serps), workers):
+        return sharded_detailed_rows(serps, pairs, workers)
+    return detailed_rows(serps, pairs)
+
+
+def title_ngrams(serps, top_k=None, stopwords=None, workers=None):
+    # N-grams over every SERP's titles, counted per block of SERPs in the pool for large lists
+    from serp_shard import sharded_ngram_analysis, use_pool
+
+    if use_pool(len(serps), workers):
+        return sharded_ngram_analysis(serps, top_k, stopwords, workers)
+    return ngram_analysis((title for serp in serps.values() for title in serp.titles), top_k, stopwords)
+
+
+def scheduled_keyword_serps(keywords, args):
+    # Rate-limited, budgeted and checkpointed fetch for long jobs; returns None
+    # when keywords are left over so the caller can stop before scoring
+    from serp_scheduler import run_job
+
+    def progress(done, pending, failed):
+        print(f"\r{done}/{len(keywords)} keywords fetched, {failed} failed", end="", file=sys.stderr)
+
+    serps, scheduler = run_job(keywords, args.api_key, args.search_engine, args.language, args.device, args.depth,
+                               args.checkpoint, args.rate_limit, args.budget, args.force_refresh, progress)
+    print(file=sys.stderr)
+    for keyword, error in scheduler.failed.items():
+        print(f"{keyword}: {error}", file=sys.stderr)
+    if scheduler.pending:
+        reason = "credit budget exhausted" if scheduler.budget_exhausted else "stopped"
+        print(f"{reason} with {scheduler.pending} keywords left; rerun with the same --checkpoint to resume",
+              file=sys.stderr)
+        return None
+    return serps
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare SERP similarity for every pair in a keyword list.")
+    parser.add_argument("keywords", help="CSV or text file with one keyword per line ('-' for stdin)")
+    parser.add_argument("--api-key", default=os.environ.get("SERPAPI_KEY", ""))
+    parser.add_argument("--search-engine", default="google.com")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--device", default="Desktop")
+    parser.add_argument("--depth", type=int, choices=SERP_DEPTHS, default=10)
+    parser.add_argument("--min-similarity", type=float, default=0)
+    parser.add_argument("--rank-weighted", action="store_true", help="Weight shared URLs by their positions")
+    parser.add_argument("--approximate", action="store_true",
+                        help="Use MinHash/LSH candidates instead of exact all-pairs (needs --min-similarity)")
+    parser.add_argument("--target-recall", type=float, default=0.95,
+                        help="Share of pairs at the threshold that --approximate should find")
+    parser.add_argument("--force-refresh", action="store_true")
+    parser.add_argument("--checkpoint", help="JSONL file recording finished keywords; rerun with it to resume")
+    parser.add_argument("--rate-limit", type=float, help="Max SerpAPI requests per second")
+    parser.add_argument("--budget", type=int, help="Max SerpAPI credits to spend (counted across resumes)")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default=DEFAULT_EXPORT_FORMAT, help="Output format")
+    parser.add_argument("--detailed", action="store_true",
+                        help="Full comparison rows: shared URLs with ranks, shared domains, RBO")
+    parser.add_argument("--workers", type=int,
+                        help="Processes for scoring large lists (default: SERP_ANALYSIS_WORKERS or the CPU count)")
+    parser.add_argument("-o", "--output", help="File to write (defaults to stdout)")
+    args = parser.parse_args(argv)
+
+    keywords = read_keyword_file(args.keywords)
+
+    if args.checkpoint or args.rate_limit or args.budget:
+        serps = scheduled_keyword_serps(dedupe_keywords(keywords), args)
+        if serps is None:
+            sys.exit(1)
+    else:
+        serps = fetch_keyword_serps(keywords, args.api_key, args.search_engine, args.language, args.device,
+                                    force_refresh=args.force_refresh, depth=args.depth)
+    if args.approximate and args.min_similarity > 0 and not args.rank_weighted:
+        log_recall(serps, args.min_similarity, args.target_recall)
+    rows = pairwise_similarity(serps, args.min_similarity, args.rank_weighted, args.approximate, args.target_recall,
+                               args.workers)
+    columns = BULK_COLUMNS
+    if args.detailed:
+        rows, columns = detailed_pair_rows(serps, rows, args.workers), COMPARISON_COLUMNS
+    # Rows are encoded and written a chunk at a time as they are scored
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        write_rows(rows, out, args.format, columns)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
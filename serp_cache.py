@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Only these params identify a SERP; the API key is never part of the key
+CACHE_KEY_PARAMS = ("q", "gl", "hl", "device", "num")
+
+DEFAULT_CACHE_PATH = os.environ.get("SERP_CACHE_PATH", ".serp_cache.sqlite3")
+DEFAULT_CACHE_TTL = int(os.environ.get("SERP_CACHE_TTL", 24 * 60 * 60))
+DEFAULT_CACHE_MAX_ENTRIES = int(os.environ.get("SERP_CACHE_MAX_ENTRIES", 5000))
+
+
+def normalize_params(params):
+    normalized = {}
+    for name in CACHE_KEY_PARAMS:
+        value = params.get(name, "")
+        normalized[name] = " ".join(str(value).lower().split())
+    # Deep SERPs are cached page by page; first pages keep their original key
+    start = str(params.get("start") or 0)
+    if start != "0":
+        normalized["start"] = start
+    return normalized
+
+
+def cache_key(params):
+    payload = json.dumps(normalize_params(params), sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SerpCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_CACHE_TTL, max_entries=DEFAULT_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS serp_cache ("
+            "key TEXT PRIMARY KEY, payload TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS serp_cache_accessed ON serp_cache (accessed_at)")
+        self._conn.commit()
+
+    def get(self, params):
+        key = cache_key(params)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, created_at FROM serp_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl and now - row[1] > self.ttl):
+                if row is not None:
+                    self._conn.execute("DELETE FROM serp_cache WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            # Touch the entry so LRU eviction keeps recently used SERPs
+            self._conn.execute("UPDATE serp_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, params, results):
+        key = cache_key(params)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO serp_cache (key, payload, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(results), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        if self.ttl:
+            self._conn.execute("DELETE FROM serp_cache WHERE created_at < ?", (time.time() - self.ttl,))
+        count = self._conn.execute("SELECT COUNT(*) FROM serp_cache").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM serp_cache WHERE key IN "
+                "(SELECT key FROM serp_cache ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM serp_cache")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM serp_cache").fetchone()[0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self),
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+# Streamlit re-executes the app script on every rerun, so the shared cache
+# lives here where it survives for the lifetime of the process
+def get_default_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = SerpCache()
+        return _default_cache
@@ -0,0 +1,161 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+DEFAULT_CHANGES_PATH = os.environ.get("SERP_CHANGES_PATH", ".serp_changes.sqlite3")
+
+
+def serp_hash(urls):
+    return hashlib.sha1("\n".join(urls).encode("utf-8")).hexdigest()
+
+
+def diff_serps(previous, current):
+    # Change events between two ranked URL lists. A domain that lost one page and
+    # gained another is reported as one domain_swap instead of a new + dropped.
+    from serp_domains import registrable_domain
+
+    before = {}
+    for rank, url in enumerate(previous, start=1):
+        before.setdefault(url, rank)
+    after = {}
+    for rank, url in enumerate(current, start=1):
+        after.setdefault(url, rank)
+    dropped = {}
+    for url, rank in before.items():
+        if url not in after:
+            dropped.setdefault(registrable_domain(url), []).append((url, rank))
+    events = []
+    for url, rank in after.items():
+        previous_rank = before.get(url)
+        if previous_rank is None:
+            swapped = dropped.get(registrable_domain(url))
+            if swapped:
+                previous_url, previous_rank = swapped.pop(0)
+                events.append({"type": "domain_swap", "url": url, "rank": rank, "previous_url": previous_url,
+                               "previous_rank": previous_rank})
+            else:
+                events.append({"type": "new", "url": url, "rank": rank})
+        elif previous_rank != rank:
+            events.append({"type": "moved", "url": url, "rank": rank, "previous_rank": previous_rank})
+    for pages in dropped.values():
+        for url, rank in pages:
+            events.append({"type": "dropped", "url": url, "previous_rank": rank})
+    return events
+
+
+class ChangeTracker:
+    # Last URL list per (keyword, market, language, device, depth). Only the
+    # hashes are held in memory, so an unchanged SERP is skipped after one dict
+    # lookup; the stored list is read back only when there is a delta to compute.
+    def __init__(self, path=DEFAULT_CHANGES_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            "keyword TEXT NOT NULL, market TEXT NOT NULL, language TEXT NOT NULL, device TEXT NOT NULL, "
+            "depth INTEGER NOT NULL, hash TEXT NOT NULL, urls TEXT NOT NULL, changed_at REAL NOT NULL, "
+            "PRIMARY KEY (keyword, market, language, device, depth))"
+        )
+        self._conn.commit()
+        self.hashes = {
+            tuple(key): digest for *key, digest in self._conn.execute(
+                "SELECT keyword, market, language, device, depth, hash FROM snapshots")
+        }
+
+    def _update(self, key, urls, now):
+        digest = serp_hash(urls)
+        previous_digest = self.hashes.get(key)
+        if previous_digest == digest:
+            return []
+        if previous_digest is None:
+            events = [{"type": "first_seen", "urls": len(urls)}]
+        else:
+            row = self._conn.execute(
+                "SELECT urls FROM snapshots WHERE keyword = ? AND market = ? AND language = ? AND device = ? "
+                "AND depth = ?", key).fetchone()
+            events = diff_serps(json.loads(row[0]), urls)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO snapshots (keyword, market, language, device, depth, hash, urls, changed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (*key, digest, json.dumps(urls), now))
+        self.hashes[key] = digest
+        keyword, market, language, device, depth = key
+        return [{"keyword": keyword, "market": market, "language": language, "device": device, **event}
+                for event in events]
+
+    def update(self, keyword, market, language, device, urls, depth=10):
+        # Stores the new list and returns its change events ([] if nothing moved)
+        return self.update_many({keyword: urls}, market, language, device, depth)
+
+    def update_many(self, serps, market, language, device, depth=10):
+        # {keyword: urls} for one market/language/device, written in one transaction
+        now = time.time()
+        events = []
+        with self._lock:
+            for keyword, urls in serps.items():
+                events.extend(self._update((keyword, market, language, device, depth), list(urls), now))
+            self._conn.commit()
+        return events
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_tracker = None
+_default_tracker_lock = threading.Lock()
+
+
+def get_default_tracker():
+    global _default_tracker
+    with _default_tracker_lock:
+        if _default_tracker is None:
+            _default_tracker = ChangeTracker()
+        return _default_tracker
+
+
+def main(argv=None):
+    from serp_bulk import fetch_keyword_serps, read_keyword_file
+    from serp_core import SERP_DEPTHS
+
+    parser = argparse.ArgumentParser(description="Fetch keywords and write what changed since the last run as "
+                                                 "JSON lines (new, dropped, moved URLs and domain swaps).")
+    parser.add_argument("keywords", help="CSV or text file with one keyword per line ('-' for stdin)")
+    parser.add_argument("--db", default=DEFAULT_CHANGES_PATH)
+    parser.add_argument("--api-key", default=os.environ.get("SERPAPI_KEY", ""))
+    parser.add_argument("--search-engine", default="google.com")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--device", default="Desktop")
+    parser.add_argument("--depth", type=int, choices=SERP_DEPTHS, default=10)
+    # Change tracking needs today's SERP, not whatever the cache kept from the
+    # last day; fresh results are still written to the cache for everyone else
+    parser.add_argument("--use-cache", action="store_true",
+                        help="Read SERPs from the cache when fresh enough instead of fetching them again")
+    args = parser.parse_args(argv)
+
+    keywords = read_keyword_file(args.keywords)
+
+    tracker = ChangeTracker(args.db)
+    serps = fetch_keyword_serps(keywords, args.api_key, args.search_engine, args.language, args.device,
+                                force_refresh=not args.use_cache, depth=args.depth)
+    failed = {keyword: serp.error for keyword, serp in serps.items() if serp.error}
+    # A failed fetch says nothing about the SERP, so it never counts as every URL dropping
+    tracked = {keyword: serp.urls for keyword, serp in serps.items() if not serp.error}
+    events = tracker.update_many(tracked, args.search_engine, args.language, args.device, args.depth)
+    for event in events:
+        sys.stdout.write(json.dumps(event, ensure_ascii=False) + "\n")
+    changed = len({event["keyword"] for event in events})
+    print(f"{len(tracked)} keywords checked, {changed} changed, {len(failed)} failed", file=sys.stderr)
+    for keyword, error in failed.items():
+        print(f"{keyword}: {error}", file=sys.stderr)
+    tracker.close()
+
+
+if __name__ == "__main__":
+    main()
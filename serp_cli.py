@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import sys
+
+# Only the standard library is imported here; each command pulls in what it needs
+
+
+def _write(row):
+    sys.stdout.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def run_compare(args):
+    from serp_core import compare, ngram_analysis
+    from serp_metrics import get_default_metrics
+
+    timings = {}
+    comparison = compare(args.keyword1, args.keyword2, args.api_key, args.search_engine, args.language,
+                         args.device, force_refresh=args.force_refresh, depth=args.depth, timings=timings)
+    with get_default_metrics().timer("ngrams", timings):
+        unigrams, bigrams, trigrams = ngram_analysis(comparison["titles1"] + comparison["titles2"])
+    comparison["ngrams"] = {
+        "unigrams": unigrams.most_common(10),
+        "bigrams": [[" ".join(ngram), freq] for ngram, freq in bigrams.most_common(10)],
+        "trigrams": [[" ".join(ngram), freq] for ngram, freq in trigrams.most_common(10)],
+    }
+    comparison["timings"] = {stage: round(seconds, 6) for stage, seconds in timings.items()}
+    _write(comparison)
+
+
+def run_fetch(args):
+    from serp_bulk import fetch_keyword_serps, read_keyword_file
+
+    serps = fetch_keyword_serps(read_keyword_file(args.keywords), args.api_key, args.search_engine, args.language,
+                                args.device, force_refresh=args.force_refresh, depth=args.depth)
+    for keyword, serp in serps.items():
+        _write({"keyword": keyword, "urls": serp.urls, "titles": serp.titles})
+
+
+def run_bulk(args):
+    from serp_bulk import (BULK_COLUMNS, detailed_pair_rows, fetch_keyword_serps, log_recall, pairwise_similarity,
+                           read_keyword_file)
+    from serp_export import COMPARISON_COLUMNS, write_rows
+
+    serps = fetch_keyword_serps(read_keyword_file(args.keywords), args.api_key, args.search_engine, args.language,
+                                args.device, force_refresh=args.force_refresh, depth=args.depth)
+    if args.approximate and args.min_similarity > 0 and not args.rank_weighted:
+        log_recall(serps, args.min_similarity, args.target_recall)
+    rows = pairwise_similarity(serps, args.min_similarity, args.rank_weighted, args.approximate, args.target_recall,
+                               workers=args.workers)
+    columns = BULK_COLUMNS
+    if args.detailed:
+        rows, columns = detailed_pair_rows(serps, rows, args.workers), COMPARISON_COLUMNS
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        write_rows(rows, out, args.format, columns)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+
+
+def run_grid(args):
+    from serp_grid import compare_grid
+
+    languages = args.languages.split(",") if args.languages else [args.language]
+    _write(compare_grid(args.keyword, args.api_key, args.markets and args.markets.split(","),
+                        args.devices and args.devices.split(","), languages,
+                        force_refresh=args.force_refresh, depth=args.depth))
+
+
+def main(argv=None):
+    from serp_core import SERP_DEPTHS
+    from serp_export import DEFAULT_EXPORT_FORMAT, EXPORT_FORMATS
+
+    parser = argparse.ArgumentParser(description="Headless SERP similarity tool; writes JSON lines to stdout.")
+    parser.add_argument("--api-key", default=os.environ.get("SERPAPI_KEY", ""))
+    parser.add_argument("--search-engine", default="google.com")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--device", default="Desktop")
+    parser.add_argument("--depth", type=int, choices=SERP_DEPTHS, default=10)
+    parser.add_argument("--force-refresh", action="store_true")
+    parser.add_argument("--metrics-file", help="Write Prometheus metrics here when done (textfile collector)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compare_parser = commands.add_parser("compare", help="Compare the SERPs of two keywords")
+    compare_parser.add_argument("keyword1")
+    compare_parser.add_argument("keyword2")
+    compare_parser.set_defaults(run=run_compare)
+
+    fetch_parser = commands.add_parser("fetch", help="Fetch and parse the SERP of every keyword in a file")
+    fetch_parser.add_argument("keywords", help="CSV or text file with one keyword per line ('-' for stdin)")
+    fetch_parser.set_defaults(run=run_fetch)
+
+    bulk_parser = commands.add_parser("bulk", help="Score every keyword pair in a file")
+    bulk_parser.add_argument("keywords", help="CSV or text file with one keyword per line ('-' for stdin)")
+    bulk_parser.add_argument("--min-similarity", type=float, default=0)
+    bulk_parser.add_argument("--rank-weighted", action="store_true")
+    bulk_parser.add_argument("--approximate", action="store_true")
+    bulk_parser.add_argument("--target-recall", type=float, default=0.95,
+                             help="Share of pairs at the threshold that --approximate should find")
+    bulk_parser.add_argument("--format", choices=EXPORT_FORMATS, default=DEFAULT_EXPORT_FORMAT, help="Output format")
+    bulk_parser.add_argument("--detailed", action="store_true", help="Full comparison rows instead of scores only")
+    bulk_parser.add_argument("--workers", type=int, help="Processes for scoring large lists (default: CPU count)")
+    bulk_parser.add_argument("-o", "--output", help="File to write (defaults to stdout)")
+    bulk_parser.set_defaults(run=run_bulk)
+
+    grid_parser = commands.add_parser("grid", help="Overlap matrix of one keyword across markets and devices")
+    grid_parser.add_argument("keyword")
+    grid_parser.add_argument("--markets", help="Comma-separated search engines, e.g. google.com,google.de (default: all)")
+    grid_parser.add_argument("--devices", help="Comma-separated devices (default: Desktop,Mobile,Tablet)")
+    grid_parser.add_argument("--languages", help="Comma-separated languages (default: --language)")
+    grid_parser.set_defaults(run=run_grid)
+
+    args = parser.parse_args(argv)
+    args.run(args)
+    if args.metrics_file:
+        from serp_metrics import get_default_metrics
+
+        # Written whole and renamed so a scraper never reads a partial file
+        tmp = f"{args.metrics_file}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(get_default_metrics().prometheus_text())
+        os.replace(tmp, args.metrics_file)
+
+
+if __name__ == "__main__":
+    main()
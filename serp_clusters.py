@@ -0,0 +1,182 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+from serp_core import serp_similarity
+
+DEFAULT_CLUSTER_PATH = os.environ.get("SERP_CLUSTER_PATH", ".serp_clusters.sqlite3")
+DEFAULT_CLUSTER_SIMILARITY = 30
+
+
+class ClusterIndex:
+    # Keywords are grouped by SERP overlap with each cluster's seed keyword. New
+    # keywords only look at clusters whose seed shares one of their URLs, found
+    # through an inverted URL -> cluster postings index, so insert cost does not
+    # depend on how many keywords are already clustered.
+    def __init__(self, path=DEFAULT_CLUSTER_PATH, min_similarity=DEFAULT_CLUSTER_SIMILARITY):
+        self.path = path
+        self.min_similarity = min_similarity
+        self.keywords = {}
+        self.clusters = {}
+        self.postings = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS keywords ("
+            "keyword TEXT PRIMARY KEY, cluster_id INTEGER NOT NULL, urls TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS clusters (id INTEGER PRIMARY KEY, seed TEXT NOT NULL)")
+        self._conn.commit()
+        self._load()
+
+    def _load(self):
+        for keyword, cluster_id, urls in self._conn.execute("SELECT keyword, cluster_id, urls FROM keywords"):
+            self.keywords[keyword] = (cluster_id, json.loads(urls))
+        for cluster_id, seed in self._conn.execute("SELECT id, seed FROM clusters"):
+            self.clusters[cluster_id] = {"seed": seed, "members": set()}
+        for keyword, (cluster_id, _) in self.keywords.items():
+            self.clusters[cluster_id]["members"].add(keyword)
+        for cluster_id, cluster in self.clusters.items():
+            self._post(cluster_id, cluster["seed"])
+
+    def _post(self, cluster_id, seed):
+        for url in self.keywords[seed][1]:
+            self.postings.setdefault(url, set()).add(cluster_id)
+
+    def _unpost(self, cluster_id, seed):
+        for url in self.keywords[seed][1]:
+            clusters = self.postings.get(url)
+            if clusters is not None:
+                clusters.discard(cluster_id)
+                if not clusters:
+                    del self.postings[url]
+
+    def assign(self, urls):
+        # Best matching cluster for a URL list, or None if no seed is similar enough
+        best_id, best_score = None, 0
+        candidates = set()
+        for url in urls:
+            candidates.update(self.postings.get(url, ()))
+        for cluster_id in candidates:
+            score = serp_similarity(urls, self.keywords[self.clusters[cluster_id]["seed"]][1])
+            if score > best_score or (score == best_score and best_id is not None and cluster_id < best_id):
+                best_id, best_score = cluster_id, score
+        if best_score >= self.min_similarity and best_score > 0:
+            return best_id, best_score
+        return None, best_score
+
+    def add(self, keyword, urls):
+        with self._lock:
+            if keyword in self.keywords:
+                self._remove(keyword)
+            cluster_id, _ = self.assign(urls)
+            if cluster_id is None:
+                cluster_id = self._conn.execute("INSERT INTO clusters (seed) VALUES (?)", (keyword,)).lastrowid
+                self.clusters[cluster_id] = {"seed": keyword, "members": set()}
+                self.keywords[keyword] = (cluster_id, list(urls))
+                # An empty SERP can never match anything, so it is not posted
+                self._post(cluster_id, keyword)
+            else:
+                self.keywords[keyword] = (cluster_id, list(urls))
+            self.clusters[cluster_id]["members"].add(keyword)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO keywords (keyword, cluster_id, urls) VALUES (?, ?, ?)",
+                (keyword, cluster_id, json.dumps(list(urls))),
+            )
+            self._conn.commit()
+            return cluster_id
+
+    def _remove(self, keyword):
+        cluster_id, _ = self.keywords[keyword]
+        cluster = self.clusters[cluster_id]
+        cluster["members"].discard(keyword)
+        self._conn.execute("DELETE FROM keywords WHERE keyword = ?", (keyword,))
+        if cluster["seed"] == keyword:
+            self._unpost(cluster_id, keyword)
+            if cluster["members"]:
+                # Promote the remaining member closest to the old seed
+                seed_urls = self.keywords[keyword][1]
+                new_seed = max(sorted(cluster["members"]),
+                               key=lambda member: serp_similarity(self.keywords[member][1], seed_urls))
+                cluster["seed"] = new_seed
+                self._post(cluster_id, new_seed)
+                self._conn.execute("UPDATE clusters SET seed = ? WHERE id = ?", (new_seed, cluster_id))
+            else:
+                del self.clusters[cluster_id]
+                self._conn.execute("DELETE FROM clusters WHERE id = ?", (cluster_id,))
+        del self.keywords[keyword]
+
+    def remove(self, keyword):
+        with self._lock:
+            if keyword not in self.keywords:
+                return False
+            self._remove(keyword)
+            self._conn.commit()
+            return True
+
+    def cluster_of(self, keyword):
+        entry = self.keywords.get(keyword)
+        return entry[0] if entry else None
+
+    def rows(self):
+        for cluster_id in sorted(self.clusters):
+            cluster = self.clusters[cluster_id]
+            seed_urls = self.keywords[cluster["seed"]][1]
+            for keyword in sorted(cluster["members"]):
+                yield {
+                    "cluster_id": cluster_id,
+                    "seed": cluster["seed"],
+                    "keyword": keyword,
+                    "similarity": serp_similarity(self.keywords[keyword][1], seed_urls),
+                }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main(argv=None):
+    from serp_bulk import read_keyword_file, fetch_keyword_serps
+
+    parser = argparse.ArgumentParser(description="Maintain a persisted SERP-overlap keyword cluster index.")
+    parser.add_argument("command", choices=["add", "remove", "show"])
+    parser.add_argument("keywords", nargs="?", help="CSV or text file with one keyword per line ('-' for stdin)")
+    parser.add_argument("--db", default=DEFAULT_CLUSTER_PATH)
+    parser.add_argument("--min-similarity", type=float, default=DEFAULT_CLUSTER_SIMILARITY)
+    parser.add_argument("--api-key", default=os.environ.get("SERPAPI_KEY", ""))
+    parser.add_argument("--search-engine", default="google.com")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--device", default="Desktop")
+    args = parser.parse_args(argv)
+
+    index = ClusterIndex(args.db, args.min_similarity)
+    keywords = read_keyword_file(args.keywords) if args.keywords else []
+
+    if args.command == "add":
+        serps = fetch_keyword_serps(keywords, args.api_key, args.search_engine, args.language, args.device)
+        # A failed fetch would be clustered as an empty SERP, so it is reported and left out
+        failed = {keyword: serp.error for keyword, serp in serps.items() if serp.error}
+        for keyword, serp in serps.items():
+            if not serp.error:
+                index.add(keyword, serp.urls)
+        for keyword, error in failed.items():
+            print(f"{keyword}: {error}", file=sys.stderr)
+        if failed:
+            print(f"{len(failed)} of {len(serps)} keywords failed and were not added", file=sys.stderr)
+    elif args.command == "remove":
+        for keyword in keywords:
+            index.remove(" ".join(keyword.split()))
+
+    writer = csv.DictWriter(sys.stdout, fieldnames=["cluster_id", "seed", "keyword", "similarity"])
+    writer.writeheader()
+    writer.writerows(index.rows())
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
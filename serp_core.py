@@ -0,0 +1,148 @@
+# SERP parsing and scoring shared by the Streamlit app and the batch tools
+
+import os
+
+# Most results SerpAPI returns for one request (its "num" limit). Every depth up
+# to this is one request, so one credit; deeper SERPs are split into pages this size.
+MAX_PAGE_SIZE = int(os.environ.get("SERP_MAX_PAGE_SIZE", 100))
+SERP_DEPTHS = (10, 20, 50, 100)
+# SerpAPI's answer for a page past the last result: the end of the SERP, not a failure
+NO_RESULTS_ERROR = "Google hasn't returned any results for this query."
+
+SEARCH_ENGINES = {
+    "Google (United States)": "google.com",
+    "Google (India)": "google.co.in",
+    "Google (United Kingdom)": "google.co.uk",
+    "Google (Canada)": "google.ca",
+    "Google (Australia)": "google.com.au",
+    "Google (Germany)": "google.de",
+    "Google (France)": "google.fr",
+    "Google (Japan)": "google.co.jp",
+    "Google (Brazil)": "google.com.br",
+    "Google (Italy)": "google.it",
+}
+LANGUAGES = ["en", "es", "fr", "de", "it", "pt", "zh", "ja", "ko", "ar", "ru"]
+DEVICES = ["Desktop", "Mobile", "Tablet"]
+
+def build_params(keyword, api_key, search_engine, language, device):
+    return {
+        "engine": "google",
+        "q": keyword,
+        "gl": "us" if search_engine == "google.com" else search_engine.split('.')[-1],
+        "hl": language,
+        "num": 20,  # Request more results to ensure we get at least 10
+        "api_key": api_key,
+        "device": device.lower()
+    }
+
+def build_page_params(keyword, api_key, search_engine, language, device, depth=10):
+    params = build_params(keyword, api_key, search_engine, language, device)
+    if depth <= params["num"]:
+        return [params]
+    if depth <= MAX_PAGE_SIZE:
+        return [dict(params, num=depth)]
+    # Only depths past the API's page limit take several requests, fetched in parallel
+    return [dict(params, num=MAX_PAGE_SIZE, start=start) for start in range(0, depth, MAX_PAGE_SIZE)]
+
+def merge_pages(pages):
+    if len(pages) == 1:
+        return pages[0]
+    # A later page running past the last result just ends the SERP; any other
+    # error fails the whole SERP rather than passing off part of it as complete.
+    # The pages that did come back are cached, so a retry only refetches the rest.
+    merged = {"organic_results": []}
+    for page in pages:
+        error = page.get("error")
+        if error and (page is pages[0] or error != NO_RESULTS_ERROR):
+            merged["error"] = error
+            break
+    seen = set()
+    for page in pages:
+        for result in page.get("organic_results", []):
+            if result.get("link") not in seen:
+                seen.add(result.get("link"))
+                merged["organic_results"].append(result)
+    return merged
+
+def get_serp_comp(results, depth=10):
+    serp_comp = []
+    if "organic_results" in results:
+        num_results = min(len(results["organic_results"]), depth)
+        for x in results["organic_results"][:num_results]:
+            serp_comp.append(x["link"])
+    return serp_comp
+
+def extract_titles(results):
+    titles = []
+    if "organic_results" in results:
+        for x in results["organic_results"]:
+            titles.append(x.get("title", ""))
+    return titles
+
+def parse_serp(results, depth=10, table=None):
+    # Compact record with .urls and .titles; the payload itself can be dropped after this.
+    # Records of one batch can share a serp_record.UrlTable so each URL is stored once.
+    from serp_record import from_results
+
+    return from_results(results, depth, table)
+
+def serp_similarity(urls1, urls2):
+    # Share of the first keyword's distinct URLs that also rank for the second one;
+    # a URL listed twice counts once, as in serp_matrix.build_incidence
+    urls1 = set(urls1)
+    exact_matches = urls1 & set(urls2)
+    return round(100 * len(exact_matches) / len(urls1), 2) if urls1 else 0
+
+def ngram_analysis(titles, top_k=None, stopwords=None):
+    from serp_ngrams import count_ngrams
+
+    return count_ngrams(titles, top_k, stopwords)
+
+# Heavy dependencies (requests, tldextract, numpy) are imported on first use so
+# a batch job that only needs part of this module starts in milliseconds
+def fetch_serps(params_list, fetcher=None, force_refresh=False):
+    if fetcher is None:
+        from serp_cache import get_default_cache
+        from serp_fetch import get_default_fetcher
+
+        fetcher = get_default_fetcher(get_default_cache())
+    return fetcher.fetch_many(params_list, force_refresh)
+
+def fetch_paged_serps(page_groups, fetcher=None, force_refresh=False):
+    # Every page of every keyword goes through one pool, then pages are merged per keyword
+    results = iter(fetch_serps([params for pages in page_groups for params in pages], fetcher, force_refresh))
+    return [merge_pages([next(results) for _ in pages]) for pages in page_groups]
+
+def compare_urls(urls1, urls2):
+    from serp_domains import common_domains
+    from serp_rank import rank_biased_overlap, weighted_jaccard
+
+    shared = set(urls2)
+    return {
+        "similarity": serp_similarity(urls1, urls2),
+        "rbo": rank_biased_overlap(urls1, urls2),
+        "weighted_jaccard": weighted_jaccard(urls1, urls2),
+        "exact_matches": [url for url in dict.fromkeys(urls1) if url in shared],
+        "common_domains": {domain: sorted(urls) for domain, urls in common_domains(urls1, urls2).items()},
+    }
+
+def compare(keyword1, keyword2, api_key, search_engine="google.com", language="en", device="Desktop",
+            fetcher=None, force_refresh=False, depth=10, timings=None):
+    from serp_metrics import get_default_metrics
+
+    metrics = get_default_metrics()
+    pages1 = build_page_params(keyword1, api_key, search_engine, language, device, depth)
+    pages2 = build_page_params(keyword2, api_key, search_engine, language, device, depth)
+    with metrics.timer("fetch", timings):
+        results1, results2 = fetch_paged_serps([pages1, pages2], fetcher, force_refresh)
+    urls1, urls2 = get_serp_comp(results1, depth), get_serp_comp(results2, depth)
+    comparison = {"keyword1": keyword1, "keyword2": keyword2}
+    with metrics.timer("match", timings):
+        comparison.update(compare_urls(urls1, urls2))
+    comparison.update({
+        "urls1": urls1,
+        "urls2": urls2,
+        "titles1": extract_titles(results1),
+        "titles2": extract_titles(results2),
+    })
+    return comparison
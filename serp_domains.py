@@ -0,0 +1,42 @@
+from functools import lru_cache
+from urllib.parse import urlparse
+
+import tldextract
+
+# Bundled public suffix snapshot: no network fetch the first time a domain is parsed
+_extract = tldextract.TLDExtract(suffix_list_urls=())
+
+
+@lru_cache(maxsize=100_000)
+def registrable_domain(url):
+    # www.example.com and blog.example.com both map to example.com
+    netloc = urlparse(url).netloc.lower()
+    host = netloc.rsplit("@", 1)[-1].split(":", 1)[0]
+    parts = _extract(host)
+    if parts.domain and parts.suffix:
+        return f"{parts.domain}.{parts.suffix}"
+    return host
+
+
+def domain_index(urls):
+    index = {}
+    for url in urls:
+        index.setdefault(registrable_domain(url), []).append(url)
+    return index
+
+
+def common_domains(urls1, urls2):
+    # Domains ranking in both SERPs with at least one pair of different pages,
+    # found through one hash lookup per domain instead of comparing every URL pair
+    index1 = domain_index(urls1)
+    index2 = domain_index(urls2)
+    shared = {}
+    for domain in index1:
+        if domain not in index2:
+            continue
+        pages1, pages2 = set(index1[domain]), set(index2[domain])
+        urls = {url for url in pages1 if pages2 - {url}} | {url for url in pages2 if pages1 - {url}}
+        if urls:
+            shared[domain] = urls
+    return shared
+
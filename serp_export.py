@@ -0,0 +1,160 @@
+import csv
+import io
+import json
+
+# Structured, machine-readable comparison rows, streamed out in chunks as
+# CSV, JSON lines or Parquet so large batches never sit in memory as one blob
+
+EXPORT_FORMATS = ("csv", "jsonl", "parquet")
+# What every command-line entry point writes unless told otherwise
+DEFAULT_EXPORT_FORMAT = "csv"
+EXPORT_MIME_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson", "parquet": "application/vnd.apache.parquet"}
+DEFAULT_CHUNK_SIZE = 5000
+
+COMPARISON_COLUMNS = [
+    "keyword1", "keyword2", "similarity", "exact_matches", "rbo", "weighted_jaccard",
+    "matched_urls", "match_ranks", "common_domains", "unigrams", "bigrams", "trigrams",
+]
+
+
+def _ngram_list(counter, n=10):
+    return [{"ngram": ngram if isinstance(ngram, str) else " ".join(ngram), "count": count}
+            for ngram, count in counter.most_common(n)]
+
+
+def comparison_row(keyword1, keyword2, urls1, urls2, comparison=None, ngrams=None):
+    # One flat-ish record per keyword pair: scores, the shared URLs with their
+    # rank in each SERP, shared domains and the top title n-grams
+    from serp_core import compare_urls
+
+    comparison = comparison or compare_urls(urls1, urls2)
+    ranks1 = {url: rank for rank, url in reversed(list(enumerate(urls1, start=1)))}
+    ranks2 = {url: rank for rank, url in reversed(list(enumerate(urls2, start=1)))}
+    exact_matches = comparison["exact_matches"]
+    row = {
+        "keyword1": keyword1,
+        "keyword2": keyword2,
+        "similarity": comparison["similarity"],
+        "exact_matches": len(exact_matches),
+        "rbo": comparison["rbo"],
+        "weighted_jaccard": comparison["weighted_jaccard"],
+        "matched_urls": list(exact_matches),
+        "match_ranks": [{"url": url, "rank1": ranks1[url], "rank2": ranks2[url]} for url in exact_matches],
+        "common_domains": list(comparison["common_domains"]),
+        "unigrams": [],
+        "bigrams": [],
+        "trigrams": [],
+    }
+    if ngrams is not None:
+        row["unigrams"], row["bigrams"], row["trigrams"] = (_ngram_list(counter) for counter in ngrams)
+    return row
+
+
+def detailed_rows(serps, pairs):
+    # Expands bulk pair rows into full comparison rows, one pair at a time
+    from serp_core import ngram_analysis
+
+    for pair in pairs:
+        serp1, serp2 = serps[pair["keyword1"]], serps[pair["keyword2"]]
+        ngrams = ngram_analysis(serp1.titles + serp2.titles)
+        yield comparison_row(pair["keyword1"], pair["keyword2"], serp1.urls, serp2.urls, ngrams=ngrams)
+
+
+def _arrow_type(name):
+    import pyarrow as pa
+
+    ngram = pa.list_(pa.struct([("ngram", pa.string()), ("count", pa.int64())]))
+    types = {
+        "keyword1": pa.string(),
+        "keyword2": pa.string(),
+        "similarity": pa.float64(),
+        "exact_matches": pa.int64(),
+        "rbo": pa.float64(),
+        "weighted_jaccard": pa.float64(),
+        "matched_urls": pa.list_(pa.string()),
+        "match_ranks": pa.list_(pa.struct([("url", pa.string()), ("rank1", pa.int32()), ("rank2", pa.int32())])),
+        "common_domains": pa.list_(pa.string()),
+        "unigrams": ngram,
+        "bigrams": ngram,
+        "trigrams": ngram,
+    }
+    return types.get(name, pa.string())
+
+
+class RowWriter:
+    # Buffers up to chunk_size rows, then encodes and writes them to a binary
+    # file in one go. Nested values become JSON strings in CSV and real
+    # list/struct columns in Parquet.
+    def __init__(self, out, fmt, columns, chunk_size=DEFAULT_CHUNK_SIZE):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format {fmt!r}; expected one of {', '.join(EXPORT_FORMATS)}")
+        self.out = out
+        self.fmt = fmt
+        self.columns = list(columns)
+        self.chunk_size = chunk_size
+        self.rows = 0
+        self._chunk = []
+        self._parquet = None
+        if fmt == "csv":
+            self._write_text(",".join(self.columns) + "\r\n")
+
+    def _write_text(self, text):
+        self.out.write(text.encode("utf-8"))
+
+    def write(self, row):
+        self._chunk.append(row)
+        if len(self._chunk) >= self.chunk_size:
+            self.flush()
+
+    def write_all(self, rows):
+        for row in rows:
+            self.write(row)
+        return self
+
+    def flush(self):
+        if not self._chunk:
+            return
+        chunk, self._chunk = self._chunk, []
+        self.rows += len(chunk)
+        if self.fmt == "jsonl":
+            self._write_text("".join(json.dumps({name: row.get(name) for name in self.columns}, ensure_ascii=False)
+                                     + "\n" for row in chunk))
+        elif self.fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in chunk:
+                writer.writerow(json.dumps(value, ensure_ascii=False) if isinstance(value, (list, dict)) else value
+                                for value in (row.get(name) for name in self.columns))
+            self._write_text(buffer.getvalue())
+        else:
+            self._flush_parquet(chunk)
+
+    def _flush_parquet(self, chunk):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([(name, _arrow_type(name)) for name in self.columns])
+        if self._parquet is None:
+            self._parquet = pq.ParquetWriter(self.out, schema, compression="zstd")
+        # Each chunk becomes its own row group
+        self._parquet.write_table(pa.Table.from_pylist(chunk, schema=schema))
+
+    def close(self):
+        self.flush()
+        if self.fmt == "parquet":
+            if self._parquet is None:
+                self._flush_parquet([])
+            self._parquet.close()
+
+
+def write_rows(rows, out, fmt, columns, chunk_size=DEFAULT_CHUNK_SIZE):
+    writer = RowWriter(out, fmt, columns, chunk_size)
+    writer.write_all(rows).close()
+    return writer.rows
+
+
+def export_bytes(rows, fmt, columns, chunk_size=DEFAULT_CHUNK_SIZE):
+    # For UI downloads, which Streamlit needs as one bytes object anyway
+    buffer = io.BytesIO()
+    write_rows(rows, buffer, fmt, columns, chunk_size)
+    return buffer.getvalue()
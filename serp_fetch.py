@@ -0,0 +1,205 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from serp_cache import cache_key
+from serp_record import parse_payload
+from serp_scheduler import BUDGET_ERROR
+
+# Point SERPAPI_URL at a local stand-in (see serp_replay.py) to run offline
+SERPAPI_URL = os.environ.get("SERPAPI_URL", "https://serpapi.com/search.json")
+
+# Wide enough for a full 10 market x 3 device grid to go out in one wave
+DEFAULT_MAX_WORKERS = int(os.environ.get("SERP_FETCH_WORKERS", 32))
+
+# Status codes worth retrying; anything else is returned to the caller as is
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    # Concurrent calls with the same key share one execution: the first caller
+    # runs it, later callers block until it finishes and get the same result
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        # Returns (result, shared); shared is True for callers that only waited
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def __len__(self):
+        with self._lock:
+            return len(self._calls)
+
+
+# One for the whole process, so every fetcher (the app's, each background job's
+# and each CLI run's) shares requests for the same query against the same API
+_flights = SingleFlight()
+
+
+class SerpFetcher:
+    def __init__(self, cache=None, max_workers=DEFAULT_MAX_WORKERS, timeout=30, max_retries=3, backoff=0.5, history=None,
+                 base_url=None, metrics=None, limiter=None, budget=None, slim=False):
+        self.cache = cache
+        self.base_url = base_url or SERPAPI_URL
+        self.history = history
+        self.metrics = metrics
+        # Optional serp_scheduler.TokenBucket and CreditBudget guarding live requests
+        self.limiter = limiter
+        self.budget = budget
+        # slim: decode only the organic results' link/title/position (serp_record.parse_payload)
+        self.slim = slim
+        # Billed searches made through this fetcher, budget or not
+        self.credits = 0
+        self._credits_lock = threading.Lock()
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        # requests is only imported once a fetcher is actually built
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        # One keep-alive session shared by every worker thread. Any transport
+        # failure (connection, timeout, a body cut off mid-stream) is retried and
+        # then returned as an error result, never raised to the caller.
+        self._errors = requests.RequestException
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate"})
+
+    def _request(self, params):
+        query = dict(params, source="python", output="json")
+        for attempt in range(self.max_retries + 1):
+            if attempt and self.metrics is not None:
+                self.metrics.inc("serpapi_retries_total")
+            if self.limiter is not None:
+                self.limiter.acquire()
+            try:
+                start = time.perf_counter()
+                response = self.session.get(self.base_url, params=query, timeout=self.timeout)
+                if self.metrics is not None:
+                    self._observe(response, time.perf_counter() - start)
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    try:
+                        results = parse_payload(response.text) if self.slim else response.json()
+                    except ValueError:
+                        return {"error": f"HTTP {response.status_code} from SerpAPI"}
+                    # SerpAPI only bills searches that come back without an error
+                    if response.ok and "error" not in results:
+                        with self._credits_lock:
+                            self.credits += 1
+                        if self.metrics is not None:
+                            self.metrics.inc("serpapi_credits_total")
+                    return results
+            except self._errors as e:
+                if self.metrics is not None:
+                    self.metrics.inc("serpapi_requests_total", status="error")
+                if attempt == self.max_retries:
+                    return {"error": str(e)}
+            # Exponential backoff with jitter before the next attempt
+            time.sleep(self.backoff * (2 ** attempt) * (1 + random.random()))
+
+    def _observe(self, response, seconds):
+        from serp_metrics import log_event
+
+        size = len(response.content)
+        self.metrics.inc("serpapi_requests_total", status=response.status_code)
+        self.metrics.inc("serpapi_response_bytes_total", size)
+        self.metrics.observe("serpapi_request_seconds", seconds)
+        log_event("serpapi_request", status=response.status_code, seconds=round(seconds, 6), bytes=size)
+
+    def fetch(self, params, force_refresh=False):
+        if self.cache is not None and not force_refresh:
+            results = self.cache.get(params)
+            if self.metrics is not None:
+                self.metrics.inc("serp_cache_lookups_total", result="miss" if results is None else "hit")
+            if results is not None:
+                return results
+        # Identical queries already in flight anywhere in the process wait for
+        # that request instead of sending their own
+        (api_key, results), shared = _flights.do((self.base_url, cache_key(params)), lambda: self._fetch_live(params))
+        if shared:
+            if self.metrics is not None:
+                self.metrics.inc("serpapi_coalesced_total")
+            # A failure may be down to the other caller's API key or credit
+            # budget rather than the query; retry with ours
+            if "error" in results and (api_key != params.get("api_key") or results["error"] == BUDGET_ERROR):
+                api_key, results = self._fetch_live(params)
+        return results
+
+    def _fetch_live(self, params):
+        if self.budget is not None and not self.budget.reserve():
+            return params.get("api_key"), {"error": BUDGET_ERROR}
+        results = None
+        try:
+            results = self._request(params)
+        finally:
+            # A failed or aborted search isn't billed, so its credit goes back
+            if self.budget is not None and (results is None or "error" in results):
+                self.budget.refund()
+        if self.cache is not None and "error" not in results:
+            self.cache.set(params, results)
+        # Every SERP pulled from the network is also kept as a dated snapshot
+        if self.history is not None:
+            self.history.record(params, results)
+        return params.get("api_key"), results
+
+    def fetch_many(self, params_list, force_refresh=False):
+        params_list = list(params_list)
+        if len(params_list) <= 1:
+            return [self.fetch(params, force_refresh) for params in params_list]
+        workers = min(self.max_workers, len(params_list))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda params: self.fetch(params, force_refresh), params_list))
+
+    def close(self):
+        self.session.close()
+
+
+_default_fetcher = None
+_default_fetcher_lock = threading.Lock()
+
+
+def get_default_fetcher(cache=None):
+    from serp_history import get_default_history
+    from serp_metrics import get_default_metrics
+    from serp_scheduler import build_budget, build_rate_limiter
+
+    global _default_fetcher
+    with _default_fetcher_lock:
+        if _default_fetcher is None:
+            # Rate limit and credit budget come from SERPAPI_RATE_LIMIT / SERPAPI_CREDIT_BUDGET
+            _default_fetcher = SerpFetcher(cache=cache, history=get_default_history(), metrics=get_default_metrics(),
+                                           limiter=build_rate_limiter(), budget=build_budget(), slim=True)
+        return _default_fetcher
@@ -0,0 +1,56 @@
+import itertools
+
+from serp_core import DEVICES, SEARCH_ENGINES, build_page_params, fetch_paged_serps, parse_serp
+
+# One keyword's SERP across markets x devices x languages, fetched in a single
+# parallel fan-out and compared cell against cell
+
+_MARKET_NAMES = {engine: name for name, engine in SEARCH_ENGINES.items()}
+
+
+def grid_cells(markets=None, devices=None, languages=("en",)):
+    # (search engine, device, language) for every combination; markets are
+    # search engine domains such as "google.co.uk"
+    markets = list(markets or SEARCH_ENGINES.values())
+    devices = list(devices or DEVICES)
+    return list(itertools.product(markets, devices, languages))
+
+
+def cell_label(cell):
+    engine, device, language = cell
+    market = _MARKET_NAMES.get(engine, engine).replace("Google (", "").rstrip(")")
+    return f"{market} / {device} / {language}"
+
+
+def fetch_grid(keyword, api_key, cells, fetcher=None, force_refresh=False, depth=10):
+    # Every page of every cell goes through one pool, so the whole grid takes
+    # about one round trip when the pool is at least as wide as the grid
+    page_groups = [build_page_params(keyword, api_key, engine, language, device, depth)
+                   for engine, device, language in cells]
+    payloads = fetch_paged_serps(page_groups, fetcher, force_refresh)
+    return {cell: parse_serp(results, depth) for cell, results in zip(cells, payloads)}
+
+
+def grid_matrix(records):
+    # Square overlap matrix in percent: row i is the share of cell i's URLs that
+    # also rank in cell j, the same score as serp_similarity
+    from serp_matrix import similarity_matrix
+
+    cells = list(records)
+    matrix = similarity_matrix([records[cell].urls for cell in cells]).toarray()
+    return cells, matrix
+
+
+def compare_grid(keyword, api_key, markets=None, devices=None, languages=("en",), fetcher=None,
+                 force_refresh=False, depth=10):
+    cells = grid_cells(markets, devices, languages)
+    records = fetch_grid(keyword, api_key, cells, fetcher, force_refresh, depth)
+    labels = [cell_label(cell) for cell in cells]
+    _, matrix = grid_matrix(records)
+    return {
+        "keyword": keyword,
+        "cells": labels,
+        "matrix": [[round(float(score), 2) for score in row] for row in matrix],
+        "urls": {label: records[cell].urls for label, cell in zip(labels, cells)},
+        "errors": {label: records[cell].error for label, cell in zip(labels, cells) if records[cell].error},
+    }
@@ -0,0 +1,147 @@
+import atexit
+import datetime
+import os
+import threading
+import uuid
+
+DEFAULT_HISTORY_PATH = os.environ.get("SERP_HISTORY_PATH", ".serp_history")
+DEFAULT_FLUSH_ROWS = int(os.environ.get("SERP_HISTORY_FLUSH_ROWS", 1000))
+
+HISTORY_COLUMNS = ("keyword", "market", "language", "device", "rank", "url", "title", "fetched_at")
+# Low-cardinality and heavily repeated strings are stored dictionary-encoded
+DICTIONARY_COLUMNS = ["keyword", "market", "language", "device", "url", "title"]
+
+
+def serp_rows(params, results, fetched_at=None):
+    fetched_at = fetched_at or datetime.datetime.now(datetime.timezone.utc)
+    offset = int(params.get("start") or 0)
+    for index, result in enumerate(results.get("organic_results", [])):
+        yield {
+            "keyword": params.get("q", ""),
+            "market": params.get("gl", ""),
+            "language": params.get("hl", ""),
+            "device": params.get("device", ""),
+            "rank": int(result.get("position") or offset + index + 1),
+            "url": result.get("link", ""),
+            "title": result.get("title", ""),
+            "fetched_at": fetched_at,
+        }
+
+
+class SnapshotStore:
+    # Append-only Parquet store of fetched SERPs, one hive partition per day
+    # (root/date=YYYY-MM-DD/*.parquet). Rows are buffered and written in batches.
+    def __init__(self, root=DEFAULT_HISTORY_PATH, flush_rows=DEFAULT_FLUSH_ROWS):
+        self.root = root
+        self.flush_rows = flush_rows
+        self._buffer = {}
+        self._buffered = 0
+        self._lock = threading.Lock()
+
+    def record(self, params, results, fetched_at=None):
+        if "error" in results:
+            return
+        rows = list(serp_rows(params, results, fetched_at))
+        if not rows:
+            return
+        date = rows[0]["fetched_at"].date().isoformat()
+        with self._lock:
+            self._buffer.setdefault(date, []).extend(rows)
+            self._buffered += len(rows)
+            if self._buffered >= self.flush_rows:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        for date, rows in self._buffer.items():
+            columns = {name: [row[name] for row in rows] for name in HISTORY_COLUMNS}
+            arrays = {name: pa.array(values) for name, values in columns.items()}
+            for name in DICTIONARY_COLUMNS:
+                arrays[name] = arrays[name].dictionary_encode()
+            arrays["rank"] = arrays["rank"].cast(pa.int16())
+            table = pa.table(arrays)
+            directory = os.path.join(self.root, f"date={date}")
+            os.makedirs(directory, exist_ok=True)
+            pq.write_table(table, os.path.join(directory, f"part-{uuid.uuid4().hex}.parquet"),
+                           use_dictionary=DICTIONARY_COLUMNS, compression="zstd")
+        self._buffer = {}
+        self._buffered = 0
+
+    def _dataset(self):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        partitioning = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+        return ds.dataset(self.root, format="parquet", partitioning=partitioning)
+
+    def query(self, columns, days=None, **equals):
+        # Scans only the requested columns; the date filter prunes whole partitions
+        import pyarrow.dataset as ds
+
+        self.flush()
+        if not os.path.isdir(self.root):
+            return []
+        condition = None
+        if days is not None:
+            today = datetime.datetime.now(datetime.timezone.utc).date()
+            since = (today - datetime.timedelta(days=days)).isoformat()
+            condition = ds.field("date") >= since
+        for name, value in equals.items():
+            if isinstance(value, (list, tuple, set)):
+                clause = ds.field(name).isin(list(value))
+            else:
+                clause = ds.field(name) == value
+            condition = clause if condition is None else condition & clause
+        return self._dataset().to_table(columns=list(columns), filter=condition).to_pylist()
+
+    def rank_history(self, url, keywords=None, days=90):
+        equals = {"url": url}
+        if keywords is not None:
+            equals["keyword"] = keywords
+        rows = self.query(["date", "keyword", "market", "device", "rank"], days, **equals)
+        return sorted(rows, key=lambda row: (row["keyword"], row["date"], row["rank"]))
+
+    def keyword_history(self, keyword, days=90):
+        rows = self.query(["date", "market", "device", "rank", "url"], days, keyword=keyword)
+        return sorted(rows, key=lambda row: (row["date"], row["rank"]))
+
+    def compact(self, date):
+        # Rewrites one day's small batch files as a single file
+        import pyarrow.parquet as pq
+
+        self.flush()
+        directory = os.path.join(self.root, f"date={date}")
+        if not os.path.isdir(directory):
+            return
+        parts = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".parquet")]
+        if len(parts) < 2:
+            return
+        # The parts are read as plain files: with hive partitioning the date
+        # directory would come back as a column and be written into the file
+        table = pq.ParquetDataset(parts, partitioning=None).read()
+        pq.write_table(table, os.path.join(directory, f"part-{uuid.uuid4().hex}.parquet"),
+                       use_dictionary=DICTIONARY_COLUMNS, compression="zstd")
+        for part in parts:
+            os.remove(part)
+
+
+_default_history = None
+_default_history_lock = threading.Lock()
+
+
+def get_default_history():
+    global _default_history
+    with _default_history_lock:
+        if _default_history is None:
+            _default_history = SnapshotStore()
+            # Buffered rows are written out when the process exits
+            atexit.register(_default_history.flush)
+        return _default_history
@@ -0,0 +1,274 @@
+import itertools
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_JOB_DIR = os.environ.get("SERP_JOB_DIR", ".serp_jobs")
+DEFAULT_JOB_WORKERS = int(os.environ.get("SERP_JOB_WORKERS", 2))
+# Pair rows are appended to the results file in chunks of this size, so a
+# running job's partial results can be read while it is still scoring
+JOB_RESULT_CHUNK_SIZE = 1000
+
+FINISHED_STATUSES = ("done", "failed", "cancelled", "stopped", "interrupted")
+# Their checkpoint only holds finished keywords, so a rerun fetches the rest
+RESUMABLE_STATUSES = ("cancelled", "stopped", "interrupted", "failed")
+JOB_COLUMNS = ("id", "kind", "status", "stage", "params", "total", "fetched", "failed", "rows", "message",
+               "created_at", "updated_at", "host", "pid")
+# Added after the first release; older job tables get them on open
+_OWNER_COLUMNS = (("host", "TEXT NOT NULL DEFAULT ''"), ("pid", "INTEGER NOT NULL DEFAULT 0"))
+
+
+def is_resumable(job):
+    # A finished job with failed keywords can be resumed to retry just those
+    return job["status"] in RESUMABLE_STATUSES or (job["status"] == "done" and job["failed"] > 0)
+
+
+def _process_alive(pid):
+    # Signal 0 checks that the process exists without touching it
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    # Persisted job table. The API key is never written to disk, so jobs that
+    # were queued or running when their process died come back as "interrupted"
+    # and can be resumed with a key; their keyword checkpoint is kept. Each job
+    # records the host and PID running it, so processes sharing the directory
+    # leave each other's jobs alone.
+    def __init__(self, root=DEFAULT_JOB_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "jobs.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, stage TEXT NOT NULL, "
+            "params TEXT NOT NULL, total INTEGER NOT NULL DEFAULT 0, fetched INTEGER NOT NULL DEFAULT 0, "
+            "failed INTEGER NOT NULL DEFAULT 0, rows INTEGER NOT NULL DEFAULT 0, message TEXT NOT NULL DEFAULT '', "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL, host TEXT NOT NULL DEFAULT '', "
+            "pid INTEGER NOT NULL DEFAULT 0)"
+        )
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for name, definition in _OWNER_COLUMNS:
+            if name not in existing:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created_at)")
+        self._conn.commit()
+
+    def path(self, job_id, name):
+        return os.path.join(self.root, f"{job_id}.{name}")
+
+    def create(self, kind, params, total=0):
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, stage, params, total, created_at, updated_at, host, pid) "
+                "VALUES (?, ?, 'queued', 'queued', ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(params, ensure_ascii=False), total, now, now, socket.gethostname(),
+                 os.getpid()),
+            )
+            self._conn.commit()
+        return job_id
+
+    def update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            self._conn.commit()
+
+    def _job(self, row):
+        job = dict(zip(JOB_COLUMNS, row))
+        job["params"] = json.loads(job["params"])
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row is not None else None
+
+    def list(self, limit=20):
+        # Newest first, without the (possibly long) keyword lists
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        jobs = [self._job(row) for row in rows]
+        for job in jobs:
+            job["params"].pop("keywords", None)
+        return jobs
+
+    def mark_interrupted(self):
+        # Called once at startup. A queued or running job is only stale when it
+        # belongs to this host and its process is gone (or had this PID, which a
+        # fresh process can't have started anything under yet); jobs of other
+        # live processes and of other hosts sharing the directory are left alone.
+        host, pid = socket.gethostname(), os.getpid()
+        with self._lock:
+            rows = self._conn.execute("SELECT id, host, pid FROM jobs WHERE status IN ('queued', 'running')").fetchall()
+            stale = [job_id for job_id, owner_host, owner_pid in rows
+                     if owner_host in (host, "") and (owner_pid == pid or not _process_alive(owner_pid))]
+            now = time.time()
+            self._conn.executemany(
+                "UPDATE jobs SET status = 'interrupted', message = 'Server restarted; resume to continue', "
+                "updated_at = ? WHERE id = ?", [(now, job_id) for job_id in stale]
+            )
+            self._conn.commit()
+        return stale
+
+    def delete(self, job_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            self._conn.commit()
+        for name in ("checkpoint.jsonl", "results.jsonl"):
+            if os.path.exists(self.path(job_id, name)):
+                os.remove(self.path(job_id, name))
+
+    def rows(self, job_id, limit=None):
+        # Result rows written so far; a line cut off mid-write is skipped
+        path = self.path(job_id, "results.jsonl")
+        if not os.path.exists(path):
+            return
+        with open(path, encoding="utf-8") as f:
+            for count, line in enumerate(f):
+                if limit is not None and count >= limit:
+                    return
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    return
+
+
+class JobRunner:
+    # Runs bulk comparison jobs on a small thread pool, off the Streamlit script
+    # thread. Progress goes to the job table as the job runs, so any session,
+    # including one opened after the tab that submitted the job was closed, can
+    # poll it. Keywords go through KeywordScheduler with a per-job checkpoint,
+    # which is what makes cancelled, stopped, interrupted and failed jobs resumable.
+    def __init__(self, store, max_workers=DEFAULT_JOB_WORKERS):
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="serp-job")
+        self._stops = {}
+        self._lock = threading.Lock()
+
+    def submit_bulk(self, keywords, api_key, search_engine, language, device, depth=10, min_similarity=0,
+                    rank_weighted=False, force_refresh=False):
+        from serp_bulk import dedupe_keywords
+
+        params = {"keywords": dedupe_keywords(keywords), "search_engine": search_engine, "language": language,
+                  "device": device, "depth": depth, "min_similarity": min_similarity,
+                  "rank_weighted": rank_weighted, "force_refresh": force_refresh}
+        job_id = self.store.create("bulk", params, total=len(params["keywords"]))
+        self._start(job_id, api_key)
+        return job_id
+
+    def resume(self, job_id, api_key):
+        job = self.store.get(job_id)
+        if job is None or not is_resumable(job):
+            return False
+        self.store.update(job_id, status="queued", stage="queued", message="", host=socket.gethostname(),
+                          pid=os.getpid())
+        self._start(job_id, api_key)
+        return True
+
+    def cancel(self, job_id):
+        with self._lock:
+            stop = self._stops.get(job_id)
+        if stop is not None:
+            stop.set()
+        return stop is not None
+
+    def _start(self, job_id, api_key):
+        stop = threading.Event()
+        with self._lock:
+            self._stops[job_id] = stop
+        self._executor.submit(self._run, job_id, api_key, stop)
+
+    def _run(self, job_id, api_key, stop):
+        try:
+            self._run_bulk(job_id, api_key, stop)
+        except Exception as exc:
+            self.store.update(job_id, status="failed", message=f"{type(exc).__name__}: {exc}")
+        finally:
+            with self._lock:
+                self._stops.pop(job_id, None)
+
+    def _run_bulk(self, job_id, api_key, stop):
+        from serp_bulk import BULK_COLUMNS, pairwise_similarity
+        from serp_export import RowWriter
+        from serp_scheduler import run_job
+
+        if stop.is_set():
+            self.store.update(job_id, status="cancelled", stage="queued")
+            return
+        params = self.store.get(job_id)["params"]
+        keywords = params["keywords"]
+        self.store.update(job_id, status="running", stage="fetch")
+
+        def progress(done, pending, failed):
+            self.store.update(job_id, fetched=done, failed=failed)
+
+        serps, scheduler = run_job(keywords, api_key, params["search_engine"], params["language"], params["device"],
+                                   params["depth"], self.store.path(job_id, "checkpoint.jsonl"),
+                                   force_refresh=params["force_refresh"], progress=progress, stop=stop)
+        failed = len(scheduler.failed)
+        self.store.update(job_id, fetched=len(serps), failed=failed)
+        if scheduler.pending:
+            if stop.is_set() and not scheduler.budget_exhausted:
+                self.store.update(job_id, status="cancelled", message=f"{scheduler.pending} keywords left")
+            else:
+                self.store.update(job_id, status="stopped",
+                                  message=f"Credit budget exhausted with {scheduler.pending} keywords left")
+            return
+        if failed and not serps:
+            # Nothing to score, e.g. a bad API key; fix it and resume to retry
+            error = next(iter(scheduler.failed.values()))
+            self.store.update(job_id, status="failed", message=f"All {failed} keywords failed: {error}")
+            return
+
+        # Scores are rewritten from scratch on every (re)run; fetching is what resumes
+        self.store.update(job_id, stage="score", rows=0)
+        rows = pairwise_similarity(serps, params["min_similarity"], params["rank_weighted"])
+        with open(self.store.path(job_id, "results.jsonl"), "wb") as out:
+            writer = RowWriter(out, "jsonl", BULK_COLUMNS, JOB_RESULT_CHUNK_SIZE)
+            while True:
+                chunk = list(itertools.islice(rows, JOB_RESULT_CHUNK_SIZE))
+                if not chunk:
+                    break
+                writer.write_all(chunk).flush()
+                out.flush()
+                self.store.update(job_id, rows=writer.rows)
+                if stop.is_set():
+                    self.store.update(job_id, status="cancelled", message="Cancelled while scoring")
+                    return
+            writer.close()
+        message = f"{failed} keywords failed; resume the job to retry them" if failed else ""
+        self.store.update(job_id, status="done", stage="done", rows=writer.rows, message=message)
+
+
+_default_runner = None
+_default_runner_lock = threading.Lock()
+
+
+def get_default_runner():
+    global _default_runner
+    with _default_runner_lock:
+        if _default_runner is None:
+            store = JobStore()
+            store.mark_interrupted()
+            _default_runner = JobRunner(store)
+        return _default_runner
@@ -0,0 +1,237 @@
+import hashlib
+import random
+
+import numpy as np
+
+_MAX_HASH = np.uint32(0xFFFFFFFF)
+_SHIFT = np.uint64(32)
+# Keywords sampled to measure recall; exact all-pairs over this many is quick
+RECALL_SAMPLE_SIZE = 2000
+
+
+def overlap_to_jaccard(similarity):
+    # serp_similarity is |A & B| / |A| in percent; for equal-length SERPs that maps to J = x / (2 - x)
+    x = similarity / 100.0
+    return x / (2.0 - x)
+
+
+def jaccard_to_overlap(jaccard):
+    return round(100.0 * 2.0 * jaccard / (1.0 + jaccard), 2)
+
+
+def collision_probability(jaccard, bands, rows):
+    # Chance that a pair with this Jaccard similarity shares at least one band
+    return 1.0 - (1.0 - jaccard ** rows) ** bands
+
+
+def choose_bands(threshold, num_perm, target_recall=0.95):
+    # Take the most selective banding that still reaches target_recall at the threshold
+    jaccard = overlap_to_jaccard(threshold)
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if collision_probability(jaccard, bands, rows) >= target_recall:
+            best = (bands, rows)
+    return best
+
+
+def _hash_url(url):
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+class MinHashLSH:
+    def __init__(self, threshold=50, num_perm=128, target_recall=0.95, seed=1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = choose_bands(threshold, num_perm, target_recall)
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing: odd a, wrapping uint64 arithmetic, keep the high 32 bits
+        self._a = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+        self._band_mix = rng.integers(0, 1 << 63, size=(self.bands, self.rows), dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        # Band hashes live in flat numpy arrays sorted per band instead of a dict of
+        # buckets, which keeps memory at 8 bytes per (keyword, band)
+        self.keys = []
+        self._rows = {}
+        self._signatures = np.empty((0, num_perm), dtype=np.uint32)
+        self._band_hashes = np.empty((0, self.bands), dtype=np.uint64)
+        self._alive = np.empty(0, dtype=bool)
+        self._pending = []
+        self._order = None
+        self._sorted_hashes = None
+
+    def _permute(self, hashes):
+        return ((np.outer(hashes, self._a) + self._b) >> _SHIFT).astype(np.uint32)
+
+    def signature(self, urls):
+        hashes = np.fromiter((_hash_url(url) for url in set(urls)), dtype=np.uint64)
+        if not len(hashes):
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        return self._permute(hashes).min(axis=0)
+
+    def batch_signatures(self, url_lists, chunk_size=2000):
+        # Batched signature() for non-empty lists; chunking keeps the permuted block small
+        for start in range(0, len(url_lists), chunk_size):
+            chunk = [set(urls) for urls in url_lists[start:start + chunk_size]]
+            lengths = np.array([len(urls) for urls in chunk])
+            hashes = np.fromiter((_hash_url(url) for urls in chunk for url in urls), dtype=np.uint64)
+            offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            yield np.minimum.reduceat(self._permute(hashes), offsets, axis=0)
+
+    def band_hashes(self, signatures):
+        # Each band of `rows` slots is folded into one 64-bit bucket hash, mixed per band
+        signatures = np.atleast_2d(signatures)[:, :self.bands * self.rows]
+        bands = signatures.reshape(len(signatures), self.bands, self.rows).astype(np.uint64)
+        return (bands * self._band_mix).sum(axis=2)
+
+    def _flush(self):
+        if not self._pending:
+            return
+        signatures = np.concatenate(self._pending)
+        self._signatures = np.concatenate([self._signatures, signatures])
+        self._band_hashes = np.concatenate([self._band_hashes, self.band_hashes(signatures)])
+        self._alive = np.concatenate([self._alive, np.ones(len(signatures), dtype=bool)])
+        self._pending = []
+        self._order = None
+
+    def _sorted(self):
+        self._flush()
+        if self._order is None:
+            self._order = np.argsort(self._band_hashes, axis=0, kind="stable")
+            self._sorted_hashes = np.take_along_axis(self._band_hashes, self._order, axis=0)
+        return self._order, self._sorted_hashes
+
+    def add_many(self, items):
+        # A key added again replaces its earlier entry, also when both are in this batch
+        items = dict(items)
+        for key in items:
+            self.remove(key)
+        # Empty SERPs would all collide with each other, so they are not indexed
+        items = [(key, urls) for key, urls in items.items() if urls]
+        for key, _ in items:
+            self._rows[key] = len(self.keys)
+            self.keys.append(key)
+        self._pending.extend(self.batch_signatures([urls for _, urls in items]))
+
+    def add(self, key, urls):
+        self.add_many([(key, urls)])
+
+    def remove(self, key):
+        row = self._rows.pop(key, None)
+        if row is not None:
+            self._flush()
+            self._alive[row] = False
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _signature_of(self, key):
+        self._flush()
+        return self._signatures[self._rows[key]]
+
+    def estimate(self, key1, key2):
+        # Share of equal MinHash slots estimates Jaccard, reported on the serp_similarity scale
+        jaccard = float(np.mean(self._signature_of(key1) == self._signature_of(key2)))
+        return jaccard_to_overlap(jaccard)
+
+    def query(self, urls, min_similarity=None):
+        # Keywords whose SERP likely shares at least min_similarity % of these URLs
+        min_similarity = self.threshold if min_similarity is None else min_similarity
+        if not urls:
+            return []
+        order, sorted_hashes = self._sorted()
+        signature = self.signature(urls)
+        probes = self.band_hashes(signature)[0]
+        candidates = set()
+        for band, probe in enumerate(probes):
+            column = sorted_hashes[:, band]
+            lo, hi = np.searchsorted(column, probe, "left"), np.searchsorted(column, probe, "right")
+            candidates.update(order[lo:hi, band].tolist())
+        rows = np.array(sorted(row for row in candidates if self._alive[row]), dtype=np.int64)
+        if not len(rows):
+            return []
+        jaccards = (self._signatures[rows] == signature).mean(axis=1)
+        matches = []
+        for row, jaccard in zip(rows.tolist(), jaccards.tolist()):
+            similarity = jaccard_to_overlap(jaccard)
+            if similarity >= min_similarity:
+                matches.append((self.keys[row], similarity))
+        return sorted(matches, key=lambda match: -match[1])
+
+    def candidate_rows(self):
+        # Row pairs (i < j) that share any band hash, as two arrays sorted by (i, j).
+        # Run boundaries in each sorted column come from np.diff, and every pair in
+        # a run is generated with numpy rather than itertools.
+        order, sorted_hashes = self._sorted()
+        codes = []
+        for band in range(self.bands):
+            alive = self._alive[order[:, band]]
+            rows = order[alive, band]
+            column = sorted_hashes[alive, band]
+            if len(column) < 2:
+                continue
+            bounds = np.flatnonzero(np.diff(column)) + 1
+            starts = np.concatenate(([0], bounds))
+            ends = np.concatenate((bounds, [len(column)]))
+            # Each position pairs with every later position before its run ends
+            counts = np.repeat(ends, ends - starts) - np.arange(len(column)) - 1
+            positions = np.flatnonzero(counts)
+            if not len(positions):
+                continue
+            counts = counts[positions]
+            left = np.repeat(positions, counts)
+            right = left + np.arange(len(left)) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+            # Pair (i, j) is encoded as i * n + j so duplicates across bands sort together
+            codes.append(np.minimum(rows[left], rows[right]) * len(self.keys) + np.maximum(rows[left], rows[right]))
+        if not codes:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        codes = np.sort(np.concatenate(codes))
+        codes = codes[np.concatenate(([True], codes[1:] != codes[:-1]))]
+        return codes // len(self.keys), codes % len(self.keys)
+
+    def candidate_pairs(self):
+        # candidate_rows() as a set of key pairs
+        firsts, seconds = self.candidate_rows()
+        return {(self.keys[row1], self.keys[row2]) for row1, row2 in zip(firsts.tolist(), seconds.tolist())}
+
+    def expected_recall(self, similarity=None):
+        similarity = self.threshold if similarity is None else similarity
+        return collision_probability(overlap_to_jaccard(similarity), self.bands, self.rows)
+
+
+def build_index(url_lists, threshold=50, num_perm=128, target_recall=0.95):
+    index = MinHashLSH(threshold, num_perm, target_recall)
+    index.add_many(enumerate(url_lists))
+    return index
+
+
+def recall_report(url_lists, index):
+    # Compares LSH candidates against the exact sparse overlap on the same lists
+    from serp_matrix import similar_pairs
+
+    exact = {(i, j) for i, j, _, _ in similar_pairs(url_lists, index.threshold)}
+    candidates = index.candidate_pairs()
+    found = len(exact & candidates)
+    return {
+        "keywords": len(url_lists),
+        "threshold": index.threshold,
+        "bands": index.bands,
+        "rows": index.rows,
+        "expected_recall": round(index.expected_recall(), 4),
+        "exact_pairs": len(exact),
+        "candidate_pairs": len(candidates),
+        "recall": round(found / len(exact), 4) if exact else 1.0,
+        "precision": round(found / len(candidates), 4) if candidates else 1.0,
+    }
+
+
+def sampled_recall_report(url_lists, threshold=50, num_perm=128, target_recall=0.95, sample_size=RECALL_SAMPLE_SIZE,
+                          seed=0):
+    # recall_report on a random sample of the lists. The banding only depends
+    # on the threshold, so the sample measures the recall of the full index.
+    if len(url_lists) > sample_size:
+        rows = sorted(random.Random(seed).sample(range(len(url_lists)), sample_size))
+        url_lists = [url_lists[row] for row in rows]
+    return recall_report(url_lists, build_index(url_lists, threshold, num_perm, target_recall))
@@ -0,0 +1,118 @@
+import numpy as np
+from scipy import sparse
+
+from serp_rank import rank_weight
+
+# Keywords scored per sparse product in similar_pairs
+PAIR_BLOCK_ROWS = 1024
+# Candidate pairs scored per sparse pass in score_pairs
+SCORE_BLOCK_PAIRS = 1 << 20
+
+
+class UrlInterner:
+    # Maps every distinct URL to a dense integer ID
+    def __init__(self):
+        self.ids = {}
+        self.urls = []
+
+    def intern(self, url):
+        url_id = self.ids.get(url)
+        if url_id is None:
+            url_id = self.ids[url] = len(self.urls)
+            self.urls.append(url)
+        return url_id
+
+    def __len__(self):
+        return len(self.urls)
+
+
+def build_incidence(url_lists, interner=None, rank_weighted=False):
+    interner = interner or UrlInterner()
+    rows, cols, ranks = [], [], []
+    for row, urls in enumerate(url_lists):
+        seen = set()
+        for rank, url in enumerate(urls, start=1):
+            # Duplicate URLs in one SERP only count at their best position
+            if url in seen:
+                continue
+            seen.add(url)
+            rows.append(row)
+            cols.append(interner.intern(url))
+            ranks.append(rank)
+    ranks = np.asarray(ranks, dtype=np.float64)
+    data = rank_weight(ranks) if rank_weighted else np.ones(len(ranks), dtype=np.float64)
+    matrix = sparse.csr_matrix((data, (rows, cols)), shape=(len(url_lists), len(interner)))
+    return matrix, interner
+
+
+def overlap_matrix(url_lists, rank_weighted=False):
+    # One sparse product gives the (weighted) shared-URL count for every pair
+    incidence, interner = build_incidence(url_lists, rank_weighted=rank_weighted)
+    overlap = (incidence @ incidence.T).tocsr()
+    return overlap, interner
+
+
+def normalize_rows(overlap):
+    # Same score as serp_similarity: row i is scaled by keyword i's own SERP
+    norms = overlap.diagonal()
+    scale = np.divide(100.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    similarity = (sparse.diags(scale) @ overlap).tocsr()
+    similarity.data = np.round(similarity.data, 2)
+    return similarity
+
+
+def similarity_matrix(url_lists, rank_weighted=False):
+    overlap, _ = overlap_matrix(url_lists, rank_weighted=rank_weighted)
+    return normalize_rows(overlap)
+
+
+def score_rows(shared, overlap, start, norms, min_similarity=0):
+    # Upper-triangle pairs of the row block starting at `start`, as (i, j,
+    # similarity, shared) arrays in (i, j) order. `shared` holds the block's
+    # plain shared-URL counts, `overlap` the (possibly rank-weighted) products
+    # and `norms` every row's overlap with itself.
+    overlap = overlap.tocoo()
+    rows = overlap.row + start
+    cols = overlap.col
+    scale = np.divide(100.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    scores = np.round(scale[rows] * overlap.data, 2)
+    keep = (cols > rows) & (scores >= min_similarity)
+    rows, cols, scores = rows[keep], cols[keep], scores[keep]
+    counts = np.asarray(shared.tocsr()[rows - start, cols]).ravel() if len(rows) else np.zeros(0)
+    order = np.lexsort((cols, rows))
+    return rows[order], cols[order], scores[order], counts[order].astype(np.int64)
+
+
+def similar_pairs(url_lists, min_similarity=0, rank_weighted=False):
+    # Yields (i, j, similarity, shared) for i < j in (i, j) order, skipping pairs
+    # with nothing in common. The incidence matrix is built once and multiplied
+    # a block of rows at a time, so only one block's products are in memory.
+    incidence, _ = build_incidence(url_lists, rank_weighted=rank_weighted)
+    ones = incidence.copy()
+    ones.data[:] = 1.0
+    ones_t = ones.T.tocsr()
+    weights_t = incidence.T.tocsr() if rank_weighted else ones_t
+    norms = np.asarray(incidence.multiply(incidence).sum(axis=1), dtype=np.float64).ravel()
+    for start in range(0, incidence.shape[0], PAIR_BLOCK_ROWS):
+        stop = start + PAIR_BLOCK_ROWS
+        shared = ones[start:stop] @ ones_t
+        overlap = incidence[start:stop] @ weights_t if rank_weighted else shared
+        rows, cols, scores, counts = score_rows(shared, overlap, start, norms, min_similarity)
+        yield from zip(rows.tolist(), cols.tolist(), scores.tolist(), counts.tolist())
+
+
+def score_pairs(url_lists, firsts, seconds, min_similarity=0):
+    # Scores the given (firsts[k], seconds[k]) pairs only, e.g. LSH candidates.
+    # Shared-URL counts are row-wise products of the two incidence rows, a block
+    # of pairs at a time, so no per-pair Python work is done.
+    incidence, _ = build_incidence(url_lists)
+    norms = np.diff(incidence.indptr).astype(np.float64)
+    for start in range(0, len(firsts), SCORE_BLOCK_PAIRS):
+        rows = firsts[start:start + SCORE_BLOCK_PAIRS]
+        cols = seconds[start:start + SCORE_BLOCK_PAIRS]
+        counts = np.asarray(incidence[rows].multiply(incidence[cols]).sum(axis=1)).ravel()
+        scale = np.divide(100.0, norms[rows], out=np.zeros(len(rows)), where=norms[rows] > 0)
+        scores = np.round(scale * counts, 2)
+        keep = (counts > 0) & (scores >= min_similarity)
+        yield from zip(rows[keep].tolist(), cols[keep].tolist(), scores[keep].tolist(),
+                       counts[keep].astype(np.int64).tolist())
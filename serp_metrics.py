@@ -0,0 +1,180 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_METRICS_PORT = int(os.environ.get("SERP_METRICS_PORT", 0))
+DEFAULT_METRICS_LOG = os.environ.get("SERP_METRICS_LOG", "") not in ("", "0")
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# name: (Prometheus type, help text)
+METRICS = {
+    "serpapi_requests_total": ("counter", "SerpAPI HTTP requests by status code"),
+    "serpapi_retries_total": ("counter", "SerpAPI requests retried after an error status or connection failure"),
+    "serpapi_credits_total": ("counter", "SerpAPI search credits used (successful live searches)"),
+    "serpapi_response_bytes_total": ("counter", "Bytes of SerpAPI response payloads"),
+    "serpapi_request_seconds": ("histogram", "Latency of single SerpAPI HTTP requests"),
+    "serpapi_coalesced_total": ("counter", "Fetches that shared an identical in-flight SerpAPI request"),
+    "serp_cache_lookups_total": ("counter", "SERP cache lookups by result (hit or miss)"),
+    "serp_stage_seconds": ("histogram", "Time spent per comparison stage"),
+}
+
+logger = logging.getLogger("serp.metrics")
+
+
+def _labels(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Metrics:
+    # Process-wide counters and latency histograms, exported as Prometheus text.
+    # Stage timings and API calls are also logged as JSON events on the
+    # "serp.metrics" logger for log-based alerting.
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(self.buckets), 0, 0.0]
+            counts = histogram[0]
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    counts[index] += 1
+            histogram[1] += 1
+            histogram[2] += seconds
+
+    @contextmanager
+    def timer(self, stage, timings=None):
+        # Records the stage's latency; with timings, also adds it to that dict so a
+        # caller can report one run's breakdown
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe("serp_stage_seconds", elapsed, stage=stage)
+            if timings is not None:
+                timings[stage] = timings.get(stage, 0) + elapsed
+            log_event("stage", stage=stage, seconds=round(elapsed, 6))
+
+    def counter(self, name, **labels):
+        with self._lock:
+            if labels:
+                return self._counters.get((name, _labels(labels)), 0)
+            return sum(value for (metric, _), value in self._counters.items() if metric == name)
+
+    def summary(self):
+        # Totals for the debug panel
+        lookups = self.counter("serp_cache_lookups_total")
+        hits = self.counter("serp_cache_lookups_total", result="hit")
+        with self._lock:
+            stages = {
+                dict(labels)["stage"]: {"count": count, "seconds": round(total, 4)}
+                for (name, labels), (_, count, total) in self._histograms.items() if name == "serp_stage_seconds"
+            }
+        return {
+            "serpapi_requests": self.counter("serpapi_requests_total"),
+            "serpapi_retries": self.counter("serpapi_retries_total"),
+            "serpapi_coalesced": self.counter("serpapi_coalesced_total"),
+            "serpapi_credits": self.counter("serpapi_credits_total"),
+            "payload_bytes": self.counter("serpapi_response_bytes_total"),
+            "cache_hit_rate": round(hits / lookups, 4) if lookups else None,
+            "stages": stages,
+        }
+
+    def prometheus_text(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(counts), count, total))
+                                for key, (counts, count, total) in self._histograms.items())
+        lines = []
+        described = set()
+
+        def describe(name):
+            if name not in described:
+                described.add(name)
+                kind, help_text = METRICS.get(name, ("untyped", name))
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            describe(name)
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), (counts, count, total) in histograms:
+            describe(name)
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{name}_bucket{_format_labels(labels, le=bound)} {bucket_count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, le='+Inf')} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="0.0.0.0"):
+        # Minimal /metrics endpoint for Prometheus to scrape
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def log_event(event, **fields):
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(dict(fields, event=event, ts=round(time.time(), 3))))
+
+
+_default_metrics = None
+_default_metrics_lock = threading.Lock()
+
+
+def get_default_metrics():
+    global _default_metrics
+    with _default_metrics_lock:
+        if _default_metrics is None:
+            _default_metrics = Metrics()
+            if DEFAULT_METRICS_LOG:
+                handler = logging.StreamHandler()
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger.addHandler(handler)
+                logger.setLevel(logging.INFO)
+            if DEFAULT_METRICS_PORT:
+                _default_metrics.serve(DEFAULT_METRICS_PORT)
+        return _default_metrics
@@ -0,0 +1,86 @@
+from collections import Counter
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how in is it of on or that the this to vs what when where which who why "
+    "with your you - | : &".split()
+)
+
+
+def tokenize(titles, stopwords=None):
+    # One lower/split per title; everything downstream reuses the token list
+    for title in titles:
+        tokens = title.lower().split()
+        if stopwords:
+            tokens = [token for token in tokens if token not in stopwords]
+        yield tokens
+
+
+class TopK:
+    # Misra-Gries heavy hitters: keeps at most ~2 * capacity keys, and every item
+    # seen more than total / (capacity + 1) times is guaranteed to survive.
+    # Counts are lower bounds once anything has been pruned (exact until then);
+    # two sketches merge by adding and pruning again.
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.counts = Counter()
+        self.exact = True
+
+    def update(self, items):
+        self.counts.update(items)
+        if len(self.counts) > 2 * self.capacity:
+            self._prune()
+
+    def _prune(self):
+        if len(self.counts) <= self.capacity:
+            return
+        cutoff = sorted(self.counts.values(), reverse=True)[self.capacity]
+        self.exact = False
+        self.counts = Counter({item: count - cutoff for item, count in self.counts.items() if count > cutoff})
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+        self.exact = self.exact and other.exact
+        self._prune()
+        return self
+
+    def most_common(self, n=None):
+        return self.counts.most_common(n)
+
+    def __getitem__(self, item):
+        return self.counts[item]
+
+    def __len__(self):
+        return len(self.counts)
+
+
+class NgramCounter:
+    # Unigram/bigram/trigram counts fed from a stream of titles. Exact Counters by
+    # default, or bounded TopK sketches when top_k is set; either kind merges
+    # with another NgramCounter of the same kind, e.g. one per worker.
+    def __init__(self, top_k=None, stopwords=None):
+        self.stopwords = stopwords
+        self.unigrams, self.bigrams, self.trigrams = (
+            Counter() if top_k is None else TopK(top_k) for _ in range(3)
+        )
+
+    def update(self, titles):
+        for tokens in tokenize(titles, self.stopwords):
+            self.unigrams.update(tokens)
+            self.bigrams.update(zip(tokens, tokens[1:]))
+            self.trigrams.update(zip(tokens, tokens[1:], tokens[2:]))
+        return self
+
+    def merge(self, other):
+        for mine, theirs in zip(self.counts(), other.counts()):
+            if isinstance(mine, TopK):
+                mine.merge(theirs)
+            else:
+                mine.update(theirs)
+        return self
+
+    def counts(self):
+        return self.unigrams, self.bigrams, self.trigrams
+
+
+def count_ngrams(titles, top_k=None, stopwords=None):
+    return NgramCounter(top_k, stopwords).update(titles).counts()
@@ -0,0 +1,47 @@
+import numpy as np
+
+
+def rank_weight(ranks):
+    # DCG-style discount: position 1 counts fully, deeper positions count less
+    return 1.0 / np.log2(np.asarray(ranks, dtype=np.float64) + 1.0)
+
+
+def _rank_arrays(urls1, urls2):
+    # 1-based best rank of every URL in the union, 0 where a list lacks it
+    positions = {}
+    for column, urls in enumerate((urls1, urls2)):
+        for rank, url in enumerate(urls, start=1):
+            slot = positions.setdefault(url, [0, 0])
+            if not slot[column]:
+                slot[column] = rank
+    if not positions:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    ranks = np.array(list(positions.values()), dtype=np.int64)
+    return ranks[:, 0], ranks[:, 1]
+
+
+def rank_biased_overlap(urls1, urls2, p=0.9):
+    # Extrapolated RBO (Webber et al. 2010) in percent; agreement near the top
+    # of both lists dominates, p sets how quickly deeper ranks stop mattering
+    depth = min(len(urls1), len(urls2))
+    if not depth:
+        return 0
+    ranks1, ranks2 = _rank_arrays(urls1[:depth], urls2[:depth])
+    shared = (ranks1 > 0) & (ranks2 > 0)
+    # A shared URL joins the overlap at the depth where the later list reaches it
+    joined = np.maximum(ranks1[shared], ranks2[shared])
+    overlap = np.cumsum(np.bincount(joined, minlength=depth + 1)[1:])
+    depths = np.arange(1, depth + 1)
+    agreement = overlap / depths
+    rbo = agreement[-1] * p ** depth + (1 - p) / p * np.sum(agreement * p ** depths)
+    return round(100 * float(rbo), 2)
+
+
+def weighted_jaccard(urls1, urls2):
+    # Jaccard over rank weights: sum of per-URL minimum over sum of maximum
+    ranks1, ranks2 = _rank_arrays(urls1, urls2)
+    if not len(ranks1):
+        return 0
+    weights1 = np.where(ranks1 > 0, rank_weight(np.maximum(ranks1, 1)), 0.0)
+    weights2 = np.where(ranks2 > 0, rank_weight(np.maximum(ranks2, 1)), 0.0)
+    return round(100 * float(np.minimum(weights1, weights2).sum() / np.maximum(weights1, weights2).sum()), 2)
@@ -0,0 +1,138 @@
+import json
+import re
+import threading
+from array import array
+
+# The only organic result fields anything downstream reads
+KEPT_FIELDS = ("position", "link", "title")
+
+_KEY_SEPARATOR = re.compile(r"\s*:\s*")
+_WHITESPACE = re.compile(r"\s*")
+_decoder = json.JSONDecoder()
+
+
+class UrlTable:
+    # URL <-> dense ID table shared by the records of one batch or job: every
+    # distinct URL string is held once, however many of its SERPs it ranks in,
+    # and the table is freed together with the batch's records
+    def __init__(self):
+        self.ids = {}
+        self.urls = []
+        self._lock = threading.Lock()
+
+    def intern(self, url):
+        url_id = self.ids.get(url)
+        if url_id is None:
+            with self._lock:
+                url_id = self.ids.get(url)
+                if url_id is None:
+                    # Append before publishing the ID so readers never see a dangling one
+                    self.urls.append(url)
+                    url_id = self.ids[url] = len(self.urls) - 1
+        return url_id
+
+    def __len__(self):
+        return len(self.urls)
+
+
+class SerpRecord:
+    # Compact parsed SERP: URL IDs in its table and their 1-based ranks in typed
+    # arrays, and the titles as one newline-joined string. A record made without
+    # a table gets one of its own. Pickles as plain URLs, so a record can cross
+    # process boundaries without dragging the batch's whole table along.
+    __slots__ = ("url_ids", "ranks", "_titles", "error", "table")
+
+    def __init__(self, urls=(), ranks=None, titles=(), error=None, table=None):
+        self.table = UrlTable() if table is None else table
+        self.url_ids = array("I", [self.table.intern(url) for url in urls])
+        self.ranks = array("H", ranks if ranks is not None else range(1, len(self.url_ids) + 1))
+        self._titles = "\n".join(" ".join(title.split()) for title in titles)
+        self.error = error
+
+    @property
+    def urls(self):
+        urls = self.table.urls
+        return [urls[url_id] for url_id in self.url_ids]
+
+    @property
+    def titles(self):
+        return self._titles.split("\n") if self._titles else []
+
+    def __len__(self):
+        return len(self.url_ids)
+
+    def __eq__(self, other):
+        if not isinstance(other, SerpRecord):
+            return NotImplemented
+        return (self.urls, list(self.ranks), self._titles, self.error) == (
+            other.urls, list(other.ranks), other._titles, other.error)
+
+    def __repr__(self):
+        return f"SerpRecord(urls={len(self.url_ids)}, titles={len(self.titles)})"
+
+    def __getstate__(self):
+        return self.urls, list(self.ranks), self._titles, self.error
+
+    def __setstate__(self, state):
+        urls, ranks, titles, error = state
+        self.table = UrlTable()
+        self.url_ids = array("I", [self.table.intern(url) for url in urls])
+        self.ranks = array("H", ranks)
+        self._titles = titles
+        self.error = error
+
+
+def from_results(results, depth=10, table=None):
+    # Top `depth` links with their positions, plus every organic title
+    organic = results.get("organic_results", [])
+    urls, ranks = [], []
+    for index, result in enumerate(organic[:depth]):
+        urls.append(result["link"])
+        ranks.append(int(result.get("position") or index + 1))
+    titles = [result.get("title", "") for result in organic]
+    return SerpRecord(urls, ranks, titles, results.get("error"), table)
+
+
+def slim_results(results):
+    # Keeps the organic results' position/link/title and any error; ads, knowledge
+    # graph, related questions and the rest are dropped
+    slim = {"organic_results": [{name: result[name] for name in KEPT_FIELDS if name in result}
+                                for result in results.get("organic_results", [])]}
+    if "error" in results:
+        slim["error"] = results["error"]
+    return slim
+
+
+def _top_level_value(text, key):
+    # The value of `key` in the top-level object, or None. Only the keys before
+    # it are decoded (their values are skipped as they come); everything after
+    # it is never parsed, and a key of the same name in a nested object can't match.
+    index = _WHITESPACE.match(text).end()
+    if not text.startswith("{", index):
+        return None
+    index += 1
+    while True:
+        index = _WHITESPACE.match(text, index).end()
+        if text.startswith("}", index):
+            return None
+        name, index = _decoder.raw_decode(text, index)
+        index = _KEY_SEPARATOR.match(text, index).end()
+        if name == key:
+            return _decoder.raw_decode(text, index)[0]
+        index = _WHITESPACE.match(text, _decoder.raw_decode(text, index)[1]).end()
+        if text.startswith(",", index):
+            index += 1
+
+
+def parse_payload(text):
+    # Decodes just the top-level "organic_results" array of a raw SerpAPI
+    # response instead of the whole document; falls back to a full parse for
+    # errors and oddities
+    if '"error"' not in text:
+        try:
+            value = _top_level_value(text, "organic_results")
+        except (ValueError, AttributeError):
+            value = None
+        if isinstance(value, list):
+            return slim_results({"organic_results": value})
+    return slim_results(json.loads(text))
@@ -0,0 +1,158 @@
+import html
+import os
+import zlib
+from functools import lru_cache
+
+# HTML for the comparison view. Templates are bound once at import, every
+# piece is assembled with a single join, and the URL table is rendered one page
+# at a time, so the cost and size of a render depend on the page size rather
+# than on the SERP depth. The static "about" section is a constant the app
+# writes once per page, separately from the results.
+
+DEFAULT_PAGE_SIZE = int(os.environ.get("SERP_TABLE_PAGE_SIZE", 20))
+COLORS = ("#FFAAAA", "#AEBCFF", "#E2FFBD", "#F3C8FF", "#FFBD59", "#D9D9D9", "#FF904C", "#FF6D6D", "#68E9FF", "#4EFF03")
+
+_SUMMARY = """
+    <div class="serp-similarity">SERP Similarity: <span>{similarity}%</span></div>
+    <div class="stats-box">
+        <h3>SERP Comparison Statistics</h3>
+        <div class="stats-item">
+            <strong>Exact Common URLs:</strong> {exact}
+        </div>
+        <div class="stats-item">
+            <strong>Same Website, Different Pages:</strong> {same_site}
+        </div>
+        <div class="stats-item">
+            <strong>Rank-Biased Overlap:</strong> {rbo}% &nbsp; <strong>Weighted Jaccard:</strong> {weighted_jaccard}%
+        </div>
+    </div>
+""".format
+_TABLE_START = """
+    <div class="serp-table-container">
+        <table class="serp-table">
+            <tr><th class="numbering">#</th><th>{keyword1}</th><th>{keyword2}</th></tr>
+""".format
+_TABLE_END = '</table>{lines}</div>'.format
+_ROW = '<tr><td class="numbering">{0}</td><td>{1}</td><td>{2}</td></tr>'.format
+_LINE = '<div class="line" style="top: {0}px;"></div>'.format
+_EXACT = ('<span class="highlighted matched-highlight" style="background-color: {color}; color: black;" '
+          'data-url="{url}">{url}</span>').format
+_SAME_SITE = ('<span style="background-color: {color}; border: 2px solid darkred; color: black;" '
+              'class="highlighted">{url} 💀</span>').format
+_PLAIN = '<span class="highlighted">{url}</span>'.format
+_NGRAM_START = """
+    <div class="ngram-table-container">
+        <h2 style="text-align: center;">{heading}</h2>
+""".format
+_NGRAM_TABLE = """
+        <table class="ngram-table">
+            <tr><th>{0}</th><th>{1}</th></tr>
+            {2}
+        </table>""".format
+_NGRAM_ROW = "<tr><td>{0}</td><td>{1}</td></tr>".format
+
+ABOUT_HTML = """
+    <div class="info-section">
+        <h2>About the SERP Similarity Tool</h2>
+        <p><a href="https://www.linkedin.com/in/altamash-mapari-44502a1a2/">Altamash Mapari</a> built this tool with the help of ChatGPT & Claude for SEOs so that everyone can enjoy and easily check the SERP Similarity in one click. This free SERP tool allows you to analyze live SERP data, understand keyword SERP overlap, and gain valuable insights into your SEO performance.</p>
+ <h2>What is SERP Similarity?</h2>
+        <p><strong>SERP Similarity</strong> refers to the comparison of search engine results pages (SERPs) for different keywords to identify commonalities and differences. By using this tool, you can analyze how similar or different the SERPs are for two keywords, helping you understand your competition and optimize your SEO strategies.</p>
+        <h2>How to Use the SERP Similarity Tool</h2>
+        <ul>
+            <li><strong>Get Your SerpAPI Key</strong>: To use this free SERP check tool, you'll need a SerpAPI key. Sign up for a free account on <a href="https://serpapi.com/">SerpAPI</a>. After registering, you can find your API key in the dashboard.</li>
+            <li><strong>Enter Your API Key</strong>: Copy your SerpAPI key and paste it into the "Enter your SerpAPI Key" field in the tool.</li>
+            <li><strong>Select Search Engine, Language, and Device</strong>: Choose your preferred search engine (e.g., Google), language, and device (Desktop, Mobile, or Tablet).</li>
+            <li><strong>Enter Keywords</strong>: Input the two keywords you want to compare in the "Enter first keyword" and "Enter second keyword" fields. This keyword SERP tool will fetch the results for both keywords.</li>
+            <li><strong>Check SERP Similarity</strong>: Click on the "Check SERP Similarity" button to run a live SERP analysis. The tool will display a table showing the URLs ranking for both keywords, along with any exact matches.</li>
+        </ul>
+        <h2>Understanding the Results</h2>
+        <ul>
+            <li><strong>Color Codes</strong>:
+                <ul>
+                    <li><strong>Red (#FFAAAA)</strong>: Indicates exact match URLs between both keyword SERPs.</li>
+                    <li><strong>Blue (#AEBCFF)</strong>, <strong>Green (#E2FFBD)</strong>, <strong>Purple (#F3C8FF)</strong>, etc.: Different colors highlight different levels of similarity or overlap.</li>
+                </ul>
+            </li>
+            <li><strong>Emoji 💀</strong>: The skull emoji indicates URLs that are from the same domain but different pages, providing insights into how competitors dominate the SERP with multiple URLs.</li>
+        </ul>
+       <p>This free SERP analysis tool is perfect for SEOs looking to gain quick insights into keyword competition and overlap. Start using this best free SERP tool today and gain valuable insights into your SEO strategy!</p>
+   <p>Made with ❤️</p>
+    </div>
+    """
+
+
+# URLs and n-grams repeat across pages, reruns and comparisons
+_escape = lru_cache(maxsize=100_000)(html.escape)
+
+
+def _color(key, index):
+    # The fixed palette first, then a color derived from the URL or domain, so a
+    # match keeps its color on every page and every rerun
+    if index < len(COLORS):
+        return COLORS[index]
+    return f"#{zlib.crc32(key.encode('utf-8')) & 0xFFFFFF:06x}"
+
+
+def color_maps(comparison):
+    # Exact matches take the first colors, then one color per shared domain
+    exact_colors = {url: _color(url, index) for index, url in enumerate(comparison["exact_matches"])}
+    domain_colors = {}
+    for index, (domain, urls) in enumerate(comparison["common_domains"].items(), start=len(exact_colors)):
+        color = _color(domain, index)
+        for url in urls:
+            domain_colors[url] = color
+    return exact_colors, domain_colors
+
+
+def _highlight(url, exact_colors, domain_colors):
+    escaped = _escape(url)
+    if url in exact_colors:
+        return _EXACT(color=exact_colors[url], url=escaped)
+    if url in domain_colors:
+        return _SAME_SITE(color=domain_colors[url], url=escaped)
+    return _PLAIN(url=escaped)
+
+
+def page_count(urls1, urls2, page_size=DEFAULT_PAGE_SIZE):
+    rows = min(len(urls1), len(urls2))
+    return max(1, -(-rows // page_size))
+
+
+def render_summary(comparison):
+    same_site = sum(len(urls) for urls in comparison["common_domains"].values()) // 2
+    return _SUMMARY(similarity=comparison["similarity"], exact=len(comparison["exact_matches"]), same_site=same_site,
+                    rbo=comparison["rbo"], weighted_jaccard=comparison["weighted_jaccard"])
+
+
+def render_table(keyword1, keyword2, urls1, urls2, comparison, page=0, page_size=DEFAULT_PAGE_SIZE):
+    # Only the rows of one page are rendered; numbering continues across pages
+    exact_colors, domain_colors = color_maps(comparison)
+    start = page * page_size
+    rows = zip(urls1[start:start + page_size], urls2[start:start + page_size])
+    body = "".join(_ROW(index, _highlight(url1, exact_colors, domain_colors), _highlight(url2, exact_colors, domain_colors))
+                   for index, (url1, url2) in enumerate(rows, start=start + 1))
+    page_matches = sum(1 for url in urls1[start:start + page_size] if url in exact_colors)
+    lines = "".join(_LINE(i * 40 + 40) for i in range(page_matches))
+    head = _TABLE_START(keyword1=html.escape(keyword1), keyword2=html.escape(keyword2))
+    return head + body + _TABLE_END(lines=lines)
+
+
+def render_ngram_table(unigrams, bigrams, trigrams, heading="N-gram Analysis Based on Top 10 Titles", top=10):
+    tables = []
+    for label, counter in (("Unigram", unigrams), ("Bi-gram", bigrams), ("Tri-gram", trigrams)):
+        rows = "".join(_NGRAM_ROW(_escape(ngram if isinstance(ngram, str) else " ".join(ngram)), freq)
+                       for ngram, freq in counter.most_common(top))
+        # A pruned top-k sketch only guarantees each count as a minimum
+        frequency = "Frequency" if getattr(counter, "exact", True) else "Frequency (at least)"
+        tables.append(_NGRAM_TABLE(label, frequency, rows))
+    return _NGRAM_START(heading=html.escape(heading)) + "".join(tables) + "</div>"
+
+
+def render_comparison(keyword1, keyword2, urls1, urls2, comparison, ngrams, page=0, page_size=DEFAULT_PAGE_SIZE):
+    # (similarity, html) for the summary, one page of the URL table and the n-grams
+    html_parts = (
+        render_summary(comparison),
+        render_table(keyword1, keyword2, urls1, urls2, comparison, page, page_size),
+        render_ngram_table(*ngrams),
+    )
+    return comparison["similarity"], "".join(html_parts)
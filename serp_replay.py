@@ -0,0 +1,226 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from serp_cache import cache_key, normalize_params
+
+DEFAULT_FIXTURE_PATH = os.environ.get("SERP_FIXTURE_PATH", "fixtures/serps")
+
+# Query params the real API takes that never change which SERP comes back
+TRANSPORT_PARAMS = ("api_key", "source", "output", "engine")
+
+SYNTHETIC_DOMAINS = 2000
+SYNTHETIC_WORDS = (
+    "best cheap top review guide buy online free near me how to price compare vs 2024 new used sale deals "
+    "software tools app service shoes laptop phone hotel flights insurance loan course recipe ideas tips"
+).split()
+
+
+class FixtureStore:
+    # Raw SerpAPI payloads on disk, one JSON file per normalized query. It has the
+    # same get/set interface as SerpCache, so a SerpFetcher built with
+    # cache=FixtureStore(...) records every live payload it fetches.
+    def __init__(self, root=DEFAULT_FIXTURE_PATH):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, params):
+        return os.path.join(self.root, cache_key(params) + ".json")
+
+    def get(self, params):
+        try:
+            with open(self._path(params), encoding="utf-8") as f:
+                return json.load(f)["results"]
+        except FileNotFoundError:
+            return None
+
+    def set(self, params, results):
+        path = self._path(params)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"params": normalize_params(params), "results": results}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def __len__(self):
+        return sum(1 for name in os.listdir(self.root) if name.endswith(".json"))
+
+
+def _seed(*parts):
+    return int.from_bytes(hashlib.sha256("\0".join(map(str, parts)).encode("utf-8")).digest()[:8], "big")
+
+
+def synthetic_serp(params, domains=SYNTHETIC_DOMAINS):
+    # Deterministic fake SERP for queries without a fixture. Keywords sharing a
+    # head term ("running shoes cheap", "running shoes best") share most of their
+    # URLs, so overlap and clustering behave like real keyword lists.
+    keyword = params.get("q", "")
+    start = int(params.get("start") or 0)
+    num = int(params.get("num") or 10)
+    market = (params.get("gl"), params.get("hl"), params.get("device"))
+    seed = _seed(keyword, start, *market)
+    topic = _seed(" ".join(keyword.split()[:-1]) or keyword, *market) % 10 ** 9
+    topic_rng = random.Random(topic)
+    # Each results page draws from its own slice of the topic's pages
+    pool = [f"https://www.site{topic_rng.randrange(domains)}.com/{topic}/{page}"
+            for page in range(2 * start, 2 * (start + num))]
+    words = topic_rng.sample(SYNTHETIC_WORDS, 6)
+    rng = random.Random(seed)
+    results = []
+    for position, link in enumerate(rng.sample(pool, num), start=start + 1):
+        # A quarter of the results are pages unique to this keyword
+        if rng.random() >= 0.75:
+            link = f"https://www.site{rng.randrange(domains)}.com/{rng.getrandbits(32):x}"
+        title = " ".join([keyword] + rng.sample(words, 3))
+        results.append({"position": position, "title": title.title(), "link": link})
+    return {
+        "search_metadata": {"status": "Success"},
+        "search_parameters": normalize_params(params),
+        "organic_results": results,
+    }
+
+
+class _StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        query = dict(parse_qsl(urlsplit(self.path).query))
+        status, payload = self.server.standin.respond(query)
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandinServer:
+    # Local SerpAPI stand-in: replays recorded fixtures (or synthetic SERPs for
+    # queries without one) after a configurable delay, and fails a configurable
+    # share of requests with a retryable 503. Failures and latency come from a
+    # seeded generator so runs are repeatable.
+    def __init__(self, fixtures=None, latency=0.0, jitter=0.0, error_rate=0.0, synthetic=True,
+                 host="127.0.0.1", port=0, seed=0):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.synthetic = synthetic
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = None
+
+    def respond(self, query):
+        params = {name: value for name, value in query.items() if name not in TRANSPORT_PARAMS}
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + self._rng.random() * self.jitter
+            failed = self._rng.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        if delay:
+            time.sleep(delay)
+        if failed:
+            return 503, {"error": "Stand-in injected failure"}
+        results = self.fixtures.get(params) if self.fixtures is not None else None
+        if results is None:
+            if not self.synthetic:
+                return 200, {"error": "No recorded fixture for this query"}
+            results = synthetic_serp(params)
+        return 200, results
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/search.json"
+
+    def start(self):
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _StandinHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.request_queue_size = 128
+        self._httpd.standin = self
+        self.port = self._httpd.server_address[1]
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def run_record(args):
+    from serp_bulk import dedupe_keywords, fetch_keyword_serps, read_keyword_file
+    from serp_fetch import SerpFetcher
+
+    keywords = dedupe_keywords(read_keyword_file(args.keywords))
+    # Fixtures act as the fetcher's cache: recorded queries are skipped on a rerun
+    fixtures = FixtureStore(args.fixtures)
+    fetcher = SerpFetcher(cache=fixtures)
+    serps = fetch_keyword_serps(keywords, args.api_key, args.search_engine, args.language, args.device,
+                                fetcher, depth=args.depth)
+    failed = sum(1 for serp in serps.values() if not serp.urls)
+    print(f"{len(fixtures)} fixtures in {args.fixtures} ({failed} keywords without results)")
+
+
+def run_serve(args):
+    server = StandinServer(FixtureStore(args.fixtures), args.latency, args.jitter, args.error_rate,
+                           not args.no_synthetic, args.host, args.port, args.seed).start()
+    print(f"Serving SerpAPI stand-in on {server.url}; run the app with SERPAPI_URL={server.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+def main(argv=None):
+    from serp_core import SERP_DEPTHS
+
+    parser = argparse.ArgumentParser(description="Record SerpAPI payloads as fixtures and replay them locally.")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURE_PATH, help="Fixture directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="Fetch live SERPs for a keyword file and save them")
+    record_parser.add_argument("keywords", help="CSV or text file with one keyword per line ('-' for stdin)")
+    record_parser.add_argument("--api-key", default=os.environ.get("SERPAPI_KEY", ""))
+    record_parser.add_argument("--search-engine", default="google.com")
+    record_parser.add_argument("--language", default="en")
+    record_parser.add_argument("--device", default="Desktop")
+    record_parser.add_argument("--depth", type=int, choices=SERP_DEPTHS, default=10)
+    record_parser.set_defaults(run=run_record)
+
+    serve_parser = commands.add_parser("serve", help="Serve fixtures on a local SerpAPI-compatible endpoint")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    serve_parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra seconds at random")
+    serve_parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    serve_parser.add_argument("--no-synthetic", action="store_true", help="Don't invent SERPs for unrecorded queries")
+    serve_parser.add_argument("--seed", type=int, default=0)
+    serve_parser.set_defaults(run=run_serve)
+
+    args = parser.parse_args(argv)
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
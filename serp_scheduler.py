@@ -0,0 +1,241 @@
+import json
+import os
+import queue
+import threading
+import time
+
+from serp_record import SerpRecord, UrlTable
+
+DEFAULT_RATE_LIMIT = float(os.environ.get("SERPAPI_RATE_LIMIT", 0))
+DEFAULT_BURST = int(os.environ.get("SERPAPI_RATE_BURST", 10))
+DEFAULT_CREDIT_BUDGET = int(os.environ.get("SERPAPI_CREDIT_BUDGET", 0))
+
+BUDGET_ERROR = "SerpAPI credit budget exhausted"
+
+
+class TokenBucket:
+    # Allows `rate` requests per second on average and bursts of up to `burst`;
+    # acquire() blocks until a token is free, so callers never see a 429 for it
+    def __init__(self, rate, burst=DEFAULT_BURST):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class CreditBudget:
+    # Hard cap on live searches. A credit is reserved before each request and
+    # given back if the search fails, since SerpAPI only bills successful ones.
+    def __init__(self, limit, spent=0):
+        self.limit = limit
+        self.spent = spent
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        with self._lock:
+            if self.spent >= self.limit:
+                return False
+            self.spent += 1
+            return True
+
+    def refund(self):
+        with self._lock:
+            self.spent -= 1
+
+    @property
+    def remaining(self):
+        with self._lock:
+            return max(0, self.limit - self.spent)
+
+    @property
+    def exhausted(self):
+        return self.remaining == 0
+
+
+def load_checkpoint(path, table=None):
+    # Finished keywords and the credits spent so far; a line cut short by a
+    # crash is ignored and that keyword is simply fetched again
+    done = {}
+    spent = 0
+    if path is None or not os.path.exists(path):
+        return done, spent
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            done[row["keyword"]] = SerpRecord(row["urls"], row.get("ranks"), row["titles"], table=table)
+            spent = max(spent, row.get("spent", 0))
+    return done, spent
+
+
+class KeywordScheduler:
+    # Fetches a keyword job through a priority queue (lower priority values run
+    # first), appending every finished keyword to a JSONL checkpoint. A rerun with
+    # the same checkpoint skips what is done and resumes the credit count. Rate
+    # limiting and the credit budget are enforced by the fetcher.
+    def __init__(self, fetcher, api_key, search_engine, language, device, depth=10, checkpoint=None,
+                 max_workers=None, stop=None):
+        self.fetcher = fetcher
+        self.api_key = api_key
+        self.search_engine = search_engine
+        self.language = language
+        self.device = device
+        self.depth = depth
+        self.checkpoint = checkpoint
+        self.max_workers = max_workers or fetcher.max_workers
+        # The job's records share one URL table, which goes away with the job
+        self.urls = UrlTable()
+        self.done, spent = load_checkpoint(checkpoint, self.urls)
+        # Credits spent by earlier runs of this checkpoint; this run's come from the fetcher
+        self._spent_before = spent
+        if fetcher.budget is not None:
+            fetcher.budget.spent = max(fetcher.budget.spent, spent)
+        self.failed = {}
+        self._queue = queue.PriorityQueue()
+        self._order = 0
+        # A shared event lets another thread (e.g. a job runner) cancel the run
+        self._stop = stop or threading.Event()
+        self._lock = threading.Lock()
+
+    def submit(self, keyword, priority=0):
+        if keyword in self.done:
+            return
+        self._order += 1
+        self._queue.put((priority, self._order, keyword))
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    @property
+    def spent(self):
+        # Credits used by this checkpoint across runs, whether or not a budget is set
+        if self.fetcher.budget is not None:
+            return self.fetcher.budget.spent
+        return self._spent_before + self.fetcher.credits
+
+    @property
+    def budget_exhausted(self):
+        return self.fetcher.budget is not None and self.fetcher.budget.exhausted
+
+    def _record(self, out, keyword, serp):
+        with self._lock:
+            self.done[keyword] = serp
+            if out is not None:
+                row = {"keyword": keyword, "urls": serp.urls, "ranks": list(serp.ranks), "titles": serp.titles,
+                       "spent": self.spent}
+                # One write of one whole line, so a crash can only cut off the last line
+                out.write((json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8"))
+                out.flush()
+
+    def _work(self, out, force_refresh):
+        from serp_core import build_page_params, merge_pages, parse_serp
+
+        while not self._stop.is_set():
+            try:
+                priority, order, keyword = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                pages = build_page_params(keyword, self.api_key, self.search_engine, self.language, self.device,
+                                          self.depth)
+                page_results = self.fetcher.fetch_many(pages, force_refresh)
+                if any(page.get("error") == BUDGET_ERROR for page in page_results):
+                    # Out of credits: put the keyword back and let every worker wind down.
+                    # Pages that did come back are cached, so the resume won't pay twice.
+                    self._queue.put((priority, order, keyword))
+                    self._stop.set()
+                    return
+                results = merge_pages(page_results)
+                serp = None if "error" in results else parse_serp(results, self.depth, self.urls)
+            except Exception as exc:
+                # Anything unexpected fails this keyword (a rerun retries it)
+                # instead of killing the worker with the keyword off the queue
+                self.failed[keyword] = f"{type(exc).__name__}: {exc}"
+                continue
+            if serp is None:
+                self.failed[keyword] = results["error"]
+                continue
+            self._record(out, keyword, serp)
+
+    def run(self, force_refresh=False, progress=None):
+        # Returns the finished SERPs; anything still pending (budget exhausted or
+        # interrupted) is picked up by the next run with the same checkpoint
+        out = None
+        if self.checkpoint:
+            # Binary, so the last byte can be checked with a plain seek from the end
+            out = open(self.checkpoint, "ab+")
+            # Start on a fresh line if the last run died halfway through writing one
+            if out.seek(0, os.SEEK_END):
+                out.seek(-1, os.SEEK_END)
+                if out.read(1) != b"\n":
+                    out.write(b"\n")
+        workers = [threading.Thread(target=self._work, args=(out, force_refresh), daemon=True)
+                   for _ in range(min(self.max_workers, max(1, self.pending)))]
+        try:
+            for worker in workers:
+                worker.start()
+            alive = workers
+            while alive:
+                # Wake at least once a second to report progress
+                alive[0].join(timeout=1)
+                alive = [worker for worker in alive if worker.is_alive()]
+                if progress is not None:
+                    progress(len(self.done), self.pending, len(self.failed))
+        except KeyboardInterrupt:
+            self._stop.set()
+            for worker in workers:
+                worker.join()
+            raise
+        finally:
+            if out is not None:
+                out.close()
+        return self.done
+
+    def stop(self):
+        self._stop.set()
+
+
+def build_rate_limiter(rate=DEFAULT_RATE_LIMIT, burst=DEFAULT_BURST):
+    return TokenBucket(rate, burst) if rate else None
+
+
+def build_budget(limit=DEFAULT_CREDIT_BUDGET):
+    return CreditBudget(limit) if limit else None
+
+
+def run_job(keywords, api_key, search_engine, language, device, depth=10, checkpoint=None, rate_limit=None,
+            budget=None, force_refresh=False, progress=None, stop=None):
+    # Fetches a keyword list in file order (earlier keywords first) with its own
+    # rate limiter and budget; returns (serps in input order, scheduler)
+    from serp_cache import get_default_cache
+    from serp_fetch import SerpFetcher
+    from serp_history import get_default_history
+    from serp_metrics import get_default_metrics
+
+    fetcher = SerpFetcher(cache=get_default_cache(), history=get_default_history(), metrics=get_default_metrics(),
+                          limiter=build_rate_limiter(DEFAULT_RATE_LIMIT if rate_limit is None else rate_limit),
+                          budget=build_budget(DEFAULT_CREDIT_BUDGET if budget is None else budget), slim=True)
+    scheduler = KeywordScheduler(fetcher, api_key, search_engine, language, device, depth, checkpoint, stop=stop)
+    for priority, keyword in enumerate(keywords):
+        scheduler.submit(keyword, priority)
+    try:
+        done = scheduler.run(force_refresh, progress)
+    finally:
+        fetcher.close()
+    return {keyword: done[keyword] for keyword in keywords if keyword in done}, scheduler
@@ -0,0 +1,196 @@
+import collections
+import itertools
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Batch analysis split across a process pool. The URL incidence matrix is
+# written once as .npy files and memory-mapped by every worker, so a task only
+# carries a row range and the OS page cache holds one copy of the matrix for
+# all cores. Per-pair details and n-grams need the SERPs themselves, which are
+# handed to each worker once when it starts, never per task.
+
+DEFAULT_ANALYSIS_WORKERS = int(os.environ.get("SERP_ANALYSIS_WORKERS", 0)) or os.cpu_count() or 1
+# Below this many keywords starting a pool costs more than it saves
+MIN_SHARDED_KEYWORDS = int(os.environ.get("SERP_SHARD_MIN_KEYWORDS", 2000))
+# Row blocks per worker; more, smaller blocks even out slow and fast workers
+BLOCKS_PER_WORKER = 4
+PAIR_CHUNK_SIZE = 500
+
+INCIDENCE_ARRAYS = ("indptr", "indices", "weights", "norms", "t_indptr", "t_indices", "t_ones", "t_weights")
+
+# Set in each worker by the pool initializer
+_arrays = {}
+_serps = {}
+
+
+def use_pool(keywords, workers=None):
+    workers = DEFAULT_ANALYSIS_WORKERS if workers is None else workers
+    return workers > 1 and keywords >= MIN_SHARDED_KEYWORDS
+
+
+def _context():
+    # Never plain fork: the app and job runner fork from a process full of threads
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _map_ordered(executor, fn, tasks, window):
+    # executor.map would submit every task up front; this keeps `window` in flight
+    pending = collections.deque()
+    for task in tasks:
+        pending.append(executor.submit(fn, task))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _url_ids(records):
+    # The records' own URL IDs when they share a table (one batch), otherwise
+    # IDs from a table built for this call
+    from serp_record import UrlTable
+
+    if all(record.table is records[0].table for record in records):
+        return [record.url_ids for record in records]
+    table = UrlTable()
+    return [[table.intern(url) for url in record.urls] for record in records]
+
+
+def record_incidence(records, rank_weighted=False):
+    # CSR arrays of the keyword x URL matrix and of its transpose, using the
+    # records' interned URL IDs as columns. Like serp_matrix.build_incidence, a
+    # URL listed twice in one SERP only counts at its best position.
+    from scipy import sparse
+    from serp_rank import rank_weight
+
+    indptr = np.zeros(len(records) + 1, dtype=np.int64)
+    indices, ranks = [], []
+    for row, url_ids in enumerate(_url_ids(records)):
+        seen = set()
+        for rank, url_id in enumerate(url_ids, start=1):
+            if url_id in seen:
+                continue
+            seen.add(url_id)
+            indices.append(url_id)
+            ranks.append(rank)
+        indptr[row + 1] = len(indices)
+    # int32 indices are what scipy uses itself, so workers wrap the maps without a copy
+    indptr = indptr.astype(np.int32)
+    indices = np.asarray(indices, dtype=np.int32)
+    weights = rank_weight(ranks) if rank_weighted else np.ones(len(indices), dtype=np.float64)
+    columns = int(indices.max()) + 1 if len(indices) else 0
+    # Each row's overlap with itself, the denominator of its similarity scores
+    norms = np.bincount(np.repeat(np.arange(len(records)), np.diff(indptr)), weights ** 2, minlength=len(records))
+    transposed = sparse.csr_matrix((weights, indices, indptr), shape=(len(records), columns)).T.tocsr()
+    return {
+        "indptr": indptr,
+        "indices": indices,
+        "weights": weights,
+        "norms": norms,
+        "t_indptr": transposed.indptr.astype(np.int32),
+        "t_indices": transposed.indices.astype(np.int32),
+        "t_ones": np.ones(len(indices), dtype=np.float64),
+        "t_weights": transposed.data,
+    }
+
+
+def _load_arrays(directory):
+    _arrays.clear()
+    for name in INCIDENCE_ARRAYS:
+        _arrays[name] = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+
+def _score_block(task):
+    # Scores rows [start, stop) against every keyword; returns the upper-triangle
+    # pairs at or above min_similarity as (i, j, similarity, shared) arrays
+    from scipy import sparse
+    from serp_matrix import score_rows
+
+    start, stop, min_similarity, rank_weighted = task
+    indptr, indices = _arrays["indptr"], _arrays["indices"]
+    keywords, columns = len(indptr) - 1, len(_arrays["t_indptr"]) - 1
+    low, high = int(indptr[start]), int(indptr[stop])
+    block_indptr = np.asarray(indptr[start:stop + 1]) - low
+
+    def block(data):
+        return sparse.csr_matrix((data, indices[low:high], block_indptr), shape=(stop - start, columns))
+
+    def transposed(data):
+        return sparse.csr_matrix((data, _arrays["t_indices"], _arrays["t_indptr"]), shape=(columns, keywords))
+
+    shared = block(np.ones(high - low)) @ transposed(_arrays["t_ones"])
+    if rank_weighted:
+        overlap = block(_arrays["weights"][low:high]) @ transposed(_arrays["t_weights"])
+    else:
+        overlap = shared
+    return score_rows(shared, overlap, start, np.asarray(_arrays["norms"]), min_similarity)
+
+
+def sharded_pairs(records, min_similarity=0, rank_weighted=False, workers=None):
+    # Same output as serp_matrix.similar_pairs for the records' URL lists, in
+    # (i, j) order, with the row blocks scored in parallel
+    workers = workers or DEFAULT_ANALYSIS_WORKERS
+    arrays = record_incidence(records, rank_weighted)
+    blocks = max(1, min(len(records), workers * BLOCKS_PER_WORKER))
+    bounds = np.linspace(0, len(records), blocks + 1).astype(int)
+    tasks = [(int(start), int(stop), min_similarity, rank_weighted)
+             for start, stop in zip(bounds, bounds[1:]) if stop > start]
+    with tempfile.TemporaryDirectory(prefix="serp-shard-") as directory:
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, f"{name}.npy"), array)
+        del arrays
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_context(), initializer=_load_arrays,
+                                 initargs=(directory,)) as executor:
+            for rows, cols, scores, counts in _map_ordered(executor, _score_block, tasks, workers * 2):
+                for i, j, score, count in zip(rows.tolist(), cols.tolist(), scores.tolist(), counts.tolist()):
+                    yield i, j, score, count
+
+
+def _load_serps(serps):
+    _serps.clear()
+    _serps.update(serps)
+
+
+def _detail_chunk(pairs):
+    from serp_export import detailed_rows
+
+    return list(detailed_rows(_serps, pairs))
+
+
+def sharded_detailed_rows(serps, pairs, workers=None):
+    # serp_export.detailed_rows (domain matching, RBO, title n-grams per pair)
+    # spread over the pool, in the order the pairs came in
+    workers = workers or DEFAULT_ANALYSIS_WORKERS
+    pairs = iter(pairs)
+    chunks = iter(lambda: list(itertools.islice(pairs, PAIR_CHUNK_SIZE)), [])
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_context(), initializer=_load_serps,
+                             initargs=(serps,)) as executor:
+        for rows in _map_ordered(executor, _detail_chunk, chunks, workers * 2):
+            yield from rows
+
+
+def _ngram_block(task):
+    from serp_ngrams import NgramCounter
+
+    keywords, top_k, stopwords = task
+    return NgramCounter(top_k, stopwords).update(title for keyword in keywords for title in _serps[keyword].titles)
+
+
+def sharded_ngram_analysis(serps, top_k=None, stopwords=None, workers=None):
+    # One NgramCounter per block of SERPs, merged in the parent
+    from serp_ngrams import NgramCounter
+
+    workers = workers or DEFAULT_ANALYSIS_WORKERS
+    keywords = list(serps)
+    size = max(1, -(-len(keywords) // (workers * BLOCKS_PER_WORKER)))
+    tasks = [(keywords[start:start + size], top_k, stopwords) for start in range(0, len(keywords), size)]
+    counter = NgramCounter(top_k, stopwords)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_context(), initializer=_load_serps,
+                             initargs=(serps,)) as executor:
+        for block in _map_ordered(executor, _ngram_block, tasks, workers * 2):
+            counter.merge(block)
+    return counter.counts()
@@ -1,16 +1,19 @@
 import streamlit as st
-import pandas as pd
-from serpapi import GoogleSearch
-from urllib.parse import urlparse
-from collections import Counter
-import itertools
-import random
-
-# Set page config for a wider layout
-st.set_page_config(layout="wide", page_title="SERP Similarity Tool")
+import datetime
+from serp_cache import get_default_cache
+from serp_fetch import get_default_fetcher
+from serp_metrics import get_default_metrics
+from serp_core import build_page_params, parse_serp, fetch_paged_serps, compare_urls, ngram_analysis, SERP_DEPTHS, SEARCH_ENGINES, LANGUAGES, DEVICES
+from serp_ngrams import STOPWORDS
+from serp_grid import grid_cells, fetch_grid, grid_matrix, cell_label
+from serp_export import comparison_row, export_bytes, COMPARISON_COLUMNS, EXPORT_FORMATS, EXPORT_MIME_TYPES
+from serp_bulk import read_keywords, dedupe_keywords, fetch_keyword_serps, pairwise_similarity, detailed_pair_rows, title_ngrams, BULK_COLUMNS, MAX_ALL_PAIRS_KEYWORDS
+from serp_jobs import get_default_runner, is_resumable, FINISHED_STATUSES
+from serp_changes import get_default_tracker
+from serp_render import ABOUT_HTML, page_count, render_comparison, render_ngram_table
 
 # Custom CSS for a more professional look and usability enhancements
-st.markdown("""
+CUSTOM_CSS = """
 <style>
     @import url('https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;500;600;700&display=swap');
     
@@ -337,202 +340,73 @@ st.markdown("""
         }
     }
 </style>
-""", unsafe_allow_html=True)
+"""
 
 # Functions
-def get_serp_comp(results):
-    serp_comp = []
-    if "organic_results" in results:
-        num_results = min(len(results["organic_results"]), 10)
-        for x in results["organic_results"][:num_results]:
-            serp_comp.append(x["link"])
-    return serp_comp
-
-def extract_titles(results):
-    titles = []
-    if "organic_results" in results:
-        for x in results["organic_results"]:
-            titles.append(x.get("title", ""))
-    return titles
-
-def ngram_analysis(titles):
-    unigrams = Counter(itertools.chain.from_iterable(title.lower().split() for title in titles))
-    bigrams = Counter(itertools.chain.from_iterable(zip(title.lower().split(), title.lower().split()[1:]) for title in titles))
-    trigrams = Counter(itertools.chain.from_iterable(zip(title.lower().split(), title.lower().split()[1:], title.lower().split()[2:]) for title in titles))
-    
-    return unigrams, bigrams, trigrams
-
-def generate_ngram_table(unigrams, bigrams, trigrams):
-    table = f"""
-    <div class="ngram-table-container">
-        <h2 style="text-align: center;">N-gram Analysis Based on Top 10 Titles</h2>
-        <table class="ngram-table">
-            <tr><th>Unigram</th><th>Frequency</th></tr>
-    """
-    for ngram, freq in unigrams.most_common(10):
-        table += f"<tr><td>{ngram}</td><td>{freq}</td></tr>"
-    
-    # Remove any unnecessary line breaks or styles
-    table += """
-        </table>
-        <table class="ngram-table">
-            <tr><th>Bi-gram</th><th>Frequency</th></tr>
-    """
-    for ngram, freq in bigrams.most_common(10):
-        table += f"<tr><td>{' '.join(ngram)}</td><td>{freq}</td></tr>"
-    
-    # Again, keep the structure consistent
-    table += """
-        </table>
-        <table class="ngram-table">
-            <tr><th>Tri-gram</th><th>Frequency</th></tr>
-    """
-    for ngram, freq in trigrams.most_common(10):
-        table += f"<tr><td>{' '.join(ngram)}</td><td>{freq}</td></tr>"
-    table += "</table></div>"
-    return table
-
-def compare_keywords(keyword1, keyword2, api_key, search_engine, language, device):
-    params = {
-        "engine": "google",
-        "q": keyword1,
-        "gl": "us" if search_engine == "google.com" else search_engine.split('.')[-1],
-        "hl": language,
-        "num": 20,  # Request more results to ensure we get at least 10
-        "api_key": api_key,
-        "device": device.lower()
-    }
-
-    # Perform search for the first keyword
-    search = GoogleSearch(params)
-    results1 = search.get_dict()
-
-    # Perform search for the second keyword
-    params["q"] = keyword2
-    search = GoogleSearch(params)
-    results2 = search.get_dict()
-
-    # Extract URLs and titles from search results
-    urls1 = get_serp_comp(results1)
-    urls2 = get_serp_comp(results2)
-    titles1 = extract_titles(results1)
-    titles2 = extract_titles(results2)
-
-    # Define color codes
-    colors = ["#FFAAAA", "#AEBCFF", "#E2FFBD", "#F3C8FF", "#FFBD59", "#D9D9D9", "#FF904C", "#FF6D6D", "#68E9FF", "#4EFF03"]
-
-    # Find common URLs and domains
-    exact_matches = set(urls1) & set(urls2)
-    common_domains = {}
-    for url1 in urls1:
-        domain1 = urlparse(url1).netloc
-        for url2 in urls2:
-            domain2 = urlparse(url2).netloc
-            if domain1 == domain2 and url1 != url2:
-                if domain1 not in common_domains:
-                    common_domains[domain1] = set()
-                common_domains[domain1].add(url1)
-                common_domains[domain1].add(url2)
-
-    # Assign colors to exact matches and common domains
-    color_map = {}
-    domain_color_map = {}
-    for url in exact_matches:
-        color = colors.pop(0) if colors else f'#{random.randint(0, 0xFFFFFF):06x}'
-        color_map[url] = color
-
-    for domain in common_domains:
-        color = colors.pop(0) if colors else f'#{random.randint(0, 0xFFFFFF):06x}'
-        for url in common_domains[domain]:
-            domain_color_map[url] = color
-
-    # Highlight URLs
-    highlighted_urls1 = []
-    highlighted_urls2 = []
-    lines_html = ""  # To store lines for matching URLs
-    for url1 in urls1:
-        if url1 in exact_matches:
-            highlighted_urls1.append(f'<span class="highlighted matched-highlight" style="background-color: {color_map[url1]}; color: black;" data-url="{url1}">{url1}</span>')
-        elif url1 in domain_color_map:
-            highlighted_urls1.append(f'<span style="background-color: {domain_color_map[url1]}; border: 2px solid darkred; color: black;" class="highlighted">{url1} 💀</span>')
-        else:
-            highlighted_urls1.append(f'<span class="highlighted">{url1}</span>')
-
-    for url2 in urls2:
-        if url2 in exact_matches:
-            highlighted_urls2.append(f'<span class="highlighted matched-highlight" style="background-color: {color_map[url2]}; color: black;" data-url="{url2}">{url2}</span>')
-        elif url2 in domain_color_map:
-            highlighted_urls2.append(f'<span style="background-color: {domain_color_map[url2]}; border: 2px solid darkred; color: black;" class="highlighted">{url2} 💀</span>')
-        else:
-            highlighted_urls2.append(f'<span class="highlighted">{url2}</span>')
-
-    # Create hover effect lines
-    for i, url in enumerate(exact_matches):
-        lines_html += f'<div class="line" style="top: {i*40 + 40}px;"></div>'
-
-    # Calculate similarity percentage
-    similarity = round(100 * len(exact_matches) / len(urls1), 2) if urls1 else 0
-
-    # Create a table to display URLs with enhanced UI
-    table = f'''
-    <div class="serp-similarity">SERP Similarity: <span>{similarity}%</span></div>
-    <div class="stats-box">
-        <h3>SERP Comparison Statistics</h3>
-        <div class="stats-item">
-            <strong>Exact Common URLs:</strong> {len(exact_matches)}
-        </div>
-        <div class="stats-item">
-            <strong>Same Website, Different Pages:</strong> {sum(len(urls) for urls in common_domains.values()) // 2}
-        </div>
-    </div>
-    <div class="serp-table-container">
-        <table class="serp-table">
-            <tr><th class="numbering">#</th><th>{keyword1}</th><th>{keyword2}</th></tr>
-    '''
-    for index, (url1, url2) in enumerate(zip(highlighted_urls1, highlighted_urls2), start=1):
-        table += f'<tr><td class="numbering">{index}</td><td>{url1}</td><td>{url2}</td></tr>'
-        if url1 in exact_matches and url2 in exact_matches:
-            table += f'<tr><td colspan="3" class="matched-line" style="background-color: {color_map[url1]};">&#x2194; Match the following lines</td></tr>'
-    table += f'</table>{lines_html}</div>'
-
-    # Perform N-gram analysis
-    all_titles = titles1 + titles2
-    unigrams, bigrams, trigrams = ngram_analysis(all_titles)
-    ngram_table = generate_ngram_table(unigrams, bigrams, trigrams)
-
-    # Additional content section
-    additional_content = """
-    <div class="info-section">
-        <h2>About the SERP Similarity Tool</h2>
-        <p><a href="https://www.linkedin.com/in/altamash-mapari-44502a1a2/">Altamash Mapari</a> built this tool with the help of ChatGPT & Claude for SEOs so that everyone can enjoy and easily check the SERP Similarity in one click. This free SERP tool allows you to analyze live SERP data, understand keyword SERP overlap, and gain valuable insights into your SEO performance.</p>
- <h2>What is SERP Similarity?</h2>
-        <p><strong>SERP Similarity</strong> refers to the comparison of search engine results pages (SERPs) for different keywords to identify commonalities and differences. By using this tool, you can analyze how similar or different the SERPs are for two keywords, helping you understand your competition and optimize your SEO strategies.</p>
-        <h2>How to Use the SERP Similarity Tool</h2>
-        <ul>
-            <li><strong>Get Your SerpAPI Key</strong>: To use this free SERP check tool, you'll need a SerpAPI key. Sign up for a free account on <a href="https://serpapi.com/">SerpAPI</a>. After registering, you can find your API key in the dashboard.</li>
-            <li><strong>Enter Your API Key</strong>: Copy your SerpAPI key and paste it into the "Enter your SerpAPI Key" field in the tool.</li>
-            <li><strong>Select Search Engine, Language, and Device</strong>: Choose your preferred search engine (e.g., Google), language, and device (Desktop, Mobile, or Tablet).</li>
-            <li><strong>Enter Keywords</strong>: Input the two keywords you want to compare in the "Enter first keyword" and "Enter second keyword" fields. This keyword SERP tool will fetch the results for both keywords.</li>
-            <li><strong>Check SERP Similarity</strong>: Click on the "Check SERP Similarity" button to run a live SERP analysis. The tool will display a table showing the URLs ranking for both keywords, along with any exact matches.</li>
-        </ul>
-        <h2>Understanding the Results</h2>
-        <ul>
-            <li><strong>Color Codes</strong>:
-                <ul>
-                    <li><strong>Red (#FFAAAA)</strong>: Indicates exact match URLs between both keyword SERPs.</li>
-                    <li><strong>Blue (#AEBCFF)</strong>, <strong>Green (#E2FFBD)</strong>, <strong>Purple (#F3C8FF)</strong>, etc.: Different colors highlight different levels of similarity or overlap.</li>
-                </ul>
-            </li>
-            <li><strong>Emoji 💀</strong>: The skull emoji indicates URLs that are from the same domain but different pages, providing insights into how competitors dominate the SERP with multiple URLs.</li>
-        </ul>
-       <p>This free SERP analysis tool is perfect for SEOs looking to gain quick insights into keyword competition and overlap. Start using this best free SERP tool today and gain valuable insights into your SEO strategy!</p>
-   <p>Made with ❤️</p>
-    </div>
-    """
-
-    return similarity, table + ngram_table + additional_content
+# Streamlit reruns main() on every widget change, so each stage below is cached
+# on its own inputs: editing keyword2 leaves keyword1's SERP and features alone
+@st.cache_resource
+def get_fetcher():
+    return get_default_fetcher(get_default_cache())
+
+@st.cache_data(show_spinner=False, max_entries=1000)
+def serp_features(results, depth=10):
+    # Keyed by the payload's content hash, so an unchanged refetch reuses the parse
+    return parse_serp(results, depth)
+
+@st.cache_data(show_spinner=False, max_entries=1000)
+def comparison_stage(urls1, urls2):
+    return compare_urls(urls1, urls2)
+
+@st.cache_data(show_spinner=False, max_entries=1000)
+def ngram_stage(titles):
+    return ngram_analysis(titles)
+
+def load_serps(keywords, api_key, search_engine, language, device, fetcher, force_refresh=False, depth=10, timings=None):
+    # Parsed SERPs stay in session state; only keywords not seen yet are fetched
+    metrics = get_default_metrics()
+    serps = st.session_state.setdefault("serps", {})
+    keys = [(keyword, search_engine, language, device, depth) for keyword in keywords]
+    missing = [key for key in dict.fromkeys(keys) if force_refresh or key not in serps]
+    fetched = {}
+    if missing:
+        page_groups = [build_page_params(keyword, api_key, search_engine, language, device, depth) for keyword, *_ in missing]
+        with metrics.timer("fetch", timings):
+            payloads = fetch_paged_serps(page_groups, fetcher, force_refresh)
+        with metrics.timer("parse", timings):
+            for key, results in zip(missing, payloads):
+                fetched[key] = serp_features(results, depth)
+                # Don't pin a failed lookup (e.g. a bad API key) for the rest of the session
+                if "error" not in results:
+                    serps[key] = fetched[key]
+    return [fetched[key] if key in fetched else serps[key] for key in keys]
+
+def compare_keywords(keyword1, keyword2, api_key, search_engine, language, device, fetcher=None, force_refresh=False, depth=10,
+                     timings=None):
+    # timings, when given, collects this run's seconds per stage for the debug panel
+    if fetcher is None:
+        fetcher = get_fetcher()
+    metrics = get_default_metrics()
+
+    # Fetch whichever keywords are not in session state yet, concurrently
+    serp1, serp2 = load_serps([keyword1, keyword2], api_key, search_engine, language, device, fetcher, force_refresh, depth, timings)
+    urls1, urls2 = serp1.urls, serp2.urls
+    titles1, titles2 = serp1.titles, serp2.titles
+    with metrics.timer("match", timings):
+        comparison = comparison_stage(urls1, urls2)
+    with metrics.timer("ngrams", timings):
+        ngrams = ngram_stage(titles1 + titles2)
+    # Everything the result view needs; main() renders one page of it per rerun
+    view = {"keyword1": keyword1, "keyword2": keyword2, "urls1": urls1, "urls2": urls2, "comparison": comparison, "ngrams": ngrams}
+    # The same result as a structured row for CSV/JSONL/Parquet export
+    row = comparison_row(keyword1, keyword2, urls1, urls2, comparison, ngrams)
+    return comparison["similarity"], view, row, (serp1, serp2)
 
 def main():
+    # Set page config for a wider layout
+    st.set_page_config(layout="wide", page_title="SERP Similarity Tool")
+    st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+
     st.title("🔍 SERP Similarity Tool")
 
     # Row 1: SERP API Key and Search Engine
@@ -542,18 +416,7 @@ def main():
         api_key = st.text_input("", type="password", help="Your SerpAPI key for fetching search results.", key="api_key_input")
     with col2:
         st.markdown('<div class="subheader">Select Search Engine</div>', unsafe_allow_html=True)
-        search_engines = {
-            "Google (United States)": "google.com",
-            "Google (India)": "google.co.in",
-            "Google (United Kingdom)": "google.co.uk",
-            "Google (Canada)": "google.ca",
-            "Google (Australia)": "google.com.au",
-            "Google (Germany)": "google.de",
-            "Google (France)": "google.fr",
-            "Google (Japan)": "google.co.jp",
-            "Google (Brazil)": "google.com.br",
-            "Google (Italy)": "google.it",
-        }
+        search_engines = SEARCH_ENGINES
         search_engine = st.selectbox(
             "", options=list(search_engines.keys()), format_func=lambda x: x
         )
@@ -562,10 +425,10 @@ def main():
     col1, col2 = st.columns(2)
     with col1:
         st.markdown('<div class="subheader">Select Language</div>', unsafe_allow_html=True)
-        language = st.selectbox("", options=["en", "es", "fr", "de", "it", "pt", "zh", "ja", "ko", "ar", "ru"], index=0)
+        language = st.selectbox("", options=LANGUAGES, index=0)
     with col2:
         st.markdown('<div class="subheader">Select Device</div>', unsafe_allow_html=True)
-        device = st.selectbox("", options=["Desktop", "Mobile", "Tablet"], index=0)
+        device = st.selectbox("", options=DEVICES, index=0)
 
     # Row 3: Keywords
     st.markdown('<div class="subheader">Enter Keywords</div>', unsafe_allow_html=True)
@@ -575,6 +438,13 @@ def main():
     with col2:
         keyword2 = st.text_input("Enter second keyword", key="keyword2")
 
+    depth = st.selectbox("SERP depth (results per keyword)", options=list(SERP_DEPTHS), index=0, key="serp_depth")
+    force_refresh = st.checkbox("Force refresh (ignore cached SERPs)", key="force_refresh")
+    diff_mode = st.checkbox("Track changes since the last check (new, dropped and moved URLs)", key="diff_mode")
+    debug = st.checkbox("Show debug panel", key="debug_panel")
+    cache = get_default_cache()
+    fetcher = get_fetcher()
+
     # Check SERP Similarity button
     st.markdown('<div class="check-button"></div>', unsafe_allow_html=True)
     if st.button("Check SERP Similarity", key="check_similarity"):
@@ -582,8 +452,169 @@ def main():
             st.markdown('<p class="error">Please enter both keywords.</p>', unsafe_allow_html=True)
         else:
             # Run SERP comparison
-            similarity, table = compare_keywords(keyword1, keyword2, api_key, search_engines[search_engine], language, device)
-            st.markdown(table, unsafe_allow_html=True)
+            timings = {}
+            # Changes are tracked against live SERPs: a cached one could be up to a day old
+            similarity, view, row, serps = compare_keywords(keyword1, keyword2, api_key, search_engines[search_engine], language, device, fetcher, force_refresh or diff_mode, depth, timings)
+            st.session_state["comparison_view"] = view
+            st.session_state["comparison_page"] = 1
+            st.session_state["comparison_row"] = row
+            st.session_state["comparison_timings"] = timings
+            if diff_mode:
+                tracked = {keyword: serp.urls for keyword, serp in zip([keyword1, keyword2], serps) if not serp.error}
+                st.session_state["comparison_changes"] = get_default_tracker().update_many(tracked, search_engines[search_engine], language, device, depth)
+            else:
+                st.session_state.pop("comparison_changes", None)
+
+    # Keep the last comparison on screen across reruns triggered by other widgets
+    if "comparison_view" in st.session_state:
+        view = st.session_state["comparison_view"]
+        # Long SERPs are shown a page of rows at a time, so the HTML stays the same size at any depth
+        pages = page_count(view["urls1"], view["urls2"])
+        page = 1
+        if pages > 1:
+            page = st.number_input(f"Results page (1-{pages})", min_value=1, max_value=pages, key="comparison_page")
+        render_timings = {}
+        with get_default_metrics().timer("render", render_timings):
+            _, html = render_comparison(**view, page=page - 1)
+        st.session_state.setdefault("comparison_timings", {}).update(render_timings)
+        st.markdown(html, unsafe_allow_html=True)
+        # Static text: one constant string, never rebuilt or stored per comparison
+        st.markdown(ABOUT_HTML, unsafe_allow_html=True)
+        stats = cache.stats()
+        st.caption(f"SERP cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} stored")
+        if "comparison_changes" in st.session_state:
+            changes = st.session_state["comparison_changes"]
+            if changes:
+                st.markdown("**Changes since the last check**")
+                st.dataframe(changes, use_container_width=True)
+            else:
+                st.caption("No changes since the last check")
+        export_format = st.selectbox("Export format", options=EXPORT_FORMATS, key="comparison_export_format")
+        if "comparison_row" in st.session_state:
+            st.download_button(f"Download comparison ({export_format})", export_bytes([st.session_state["comparison_row"]], export_format, COMPARISON_COLUMNS),
+                               file_name=f"serp_comparison.{export_format}", mime=EXPORT_MIME_TYPES[export_format], key="download_comparison")
+
+    if debug:
+        with st.expander("Debug: timings, API usage and metrics", expanded=True):
+            timings = st.session_state.get("comparison_timings", {})
+            if timings:
+                st.markdown("**Last comparison, seconds per stage**")
+                st.table({"stage": list(timings), "seconds": [round(seconds, 4) for seconds in timings.values()]})
+            st.markdown("**Since server start (all sessions)**")
+            st.json(get_default_metrics().summary())
+            st.code(get_default_metrics().prometheus_text(), language="text")
+
+    # Grid mode: one keyword across markets x devices x languages, fetched in one parallel wave
+    with st.expander("Market × Device Grid"):
+        grid_keyword = st.text_input("Keyword", value=keyword1, key="grid_keyword")
+        grid_markets = st.multiselect("Markets", options=list(search_engines), default=list(search_engines), key="grid_markets")
+        grid_devices = st.multiselect("Devices", options=DEVICES, default=DEVICES, key="grid_devices")
+        grid_languages = st.multiselect("Languages", options=LANGUAGES, default=[language], key="grid_languages")
+        if st.button("Run Grid Comparison", key="run_grid"):
+            if not grid_keyword or not grid_markets or not grid_devices or not grid_languages:
+                st.markdown('<p class="error">Please enter a keyword and pick at least one market, device and language.</p>', unsafe_allow_html=True)
+            else:
+                cells = grid_cells([search_engines[market] for market in grid_markets], grid_devices, grid_languages)
+                with st.spinner(f"Fetching {len(cells)} SERPs..."):
+                    records = fetch_grid(grid_keyword, api_key, cells, fetcher, force_refresh, depth)
+                import pandas as pd
+
+                cells, matrix = grid_matrix(records)
+                labels = [cell_label(cell) for cell in cells]
+                st.session_state["grid_matrix"] = pd.DataFrame(matrix, index=labels, columns=labels)
+                st.session_state["grid_errors"] = {cell_label(cell): record.error for cell, record in records.items() if record.error}
+        if "grid_matrix" in st.session_state:
+            for label, error in st.session_state["grid_errors"].items():
+                st.markdown(f'<p class="error">{label}: {error}</p>', unsafe_allow_html=True)
+            st.caption("Row = share of that market's URLs that also rank in the column's market (%)")
+            st.dataframe(st.session_state["grid_matrix"], use_container_width=True)
+            st.download_button("Download grid CSV", st.session_state["grid_matrix"].to_csv(), file_name="serp_grid.csv", mime="text/csv")
+
+    # Bulk mode: every keyword in the CSV is fetched once, then all pairs are compared
+    with st.expander("Bulk Keyword Comparison (CSV upload)"):
+        uploaded = st.file_uploader("Upload a CSV with one keyword per row", type=["csv", "txt"], key="bulk_keywords")
+        min_similarity = st.slider("Minimum similarity (%)", 0, 100, 0, key="bulk_min_similarity")
+        rank_weighted = st.checkbox("Weight shared URLs by ranking position", key="bulk_rank_weighted")
+        bulk_format = st.selectbox("Export format", options=EXPORT_FORMATS, key="bulk_export_format")
+        bulk_detailed = st.checkbox("Export full comparison rows (shared URLs, ranks, domains)", key="bulk_detailed")
+        background = st.checkbox("Run as a background job (keeps going if you close the tab)", value=True, key="bulk_background")
+        if st.button("Run Bulk Comparison", key="run_bulk"):
+            keywords = []
+            if uploaded is not None:
+                keywords = dedupe_keywords(read_keywords(uploaded.getvalue().decode("utf-8-sig").splitlines()))
+            if len(keywords) < 2:
+                st.markdown('<p class="error">Please upload at least two distinct keywords.</p>', unsafe_allow_html=True)
+            elif not background and min_similarity == 0 and len(keywords) > MAX_ALL_PAIRS_KEYWORDS:
+                st.markdown(f'<p class="error">Listing every pair of more than {MAX_ALL_PAIRS_KEYWORDS} keywords needs a minimum similarity or a background job.</p>', unsafe_allow_html=True)
+            elif background:
+                st.session_state["bulk_job"] = get_default_runner().submit_bulk(keywords, api_key, search_engines[search_engine], language, device, depth, min_similarity, rank_weighted, force_refresh)
+            else:
+                with st.spinner(f"Fetching {len(keywords)} SERPs..."):
+                    serps = fetch_keyword_serps(keywords, api_key, search_engines[search_engine], language, device, fetcher, force_refresh, depth)
+                import pandas as pd
+
+                pair_rows = list(pairwise_similarity(serps, min_similarity, rank_weighted))
+                pairs = pd.DataFrame(pair_rows, columns=BULK_COLUMNS)
+                pairs = pairs.sort_values("similarity", ascending=False)
+                st.dataframe(pairs, use_container_width=True)
+                if bulk_detailed:
+                    data = export_bytes(detailed_pair_rows(serps, pair_rows), bulk_format, COMPARISON_COLUMNS)
+                else:
+                    data = export_bytes(pair_rows, bulk_format, BULK_COLUMNS)
+                st.download_button(f"Download {bulk_format.upper()}", data, file_name=f"serp_similarity.{bulk_format}", mime=EXPORT_MIME_TYPES[bulk_format])
+                # Title n-grams across every uploaded SERP, kept to a bounded top-k
+                unigrams, bigrams, trigrams = title_ngrams(serps, top_k=1000, stopwords=STOPWORDS)
+                st.markdown(render_ngram_table(unigrams, bigrams, trigrams, f"N-gram Analysis Across {len(serps)} SERPs"), unsafe_allow_html=True)
+
+        background_jobs(api_key, bulk_format, bulk_detailed)
+
+@st.fragment(run_every=2)
+def background_jobs(api_key, export_format, detailed):
+    # Polls the persisted job table; reruns only this fragment, so the rest of the page is left alone
+    runner = get_default_runner()
+    jobs = runner.store.list()
+    if not jobs:
+        return
+    st.markdown("**Background jobs**")
+    labels = {job["id"]: f"{job['id']} · {job['status']} · {job['total']} keywords · {datetime.datetime.fromtimestamp(job['created_at']):%Y-%m-%d %H:%M}" for job in jobs}
+    ids = list(labels)
+    selected = st.session_state.get("bulk_job")
+    job_id = st.selectbox("Job", options=ids, index=ids.index(selected) if selected in ids else 0, format_func=labels.get, key="bulk_job_select")
+    job = runner.store.get(job_id)
+    if job["stage"] in ("queued", "fetch"):
+        st.progress(job["fetched"] / max(1, job["total"]), text=f"Fetched {job['fetched']}/{job['total']} keywords, {job['failed']} failed")
+    else:
+        st.progress(1.0, text=f"{job['rows']} pairs scored")
+    if job["message"]:
+        st.caption(job["message"])
+    col1, col2 = st.columns(2)
+    with col1:
+        if job["status"] not in FINISHED_STATUSES and st.button("Cancel job", key=f"cancel_{job_id}"):
+            runner.cancel(job_id)
+    with col2:
+        if is_resumable(job) and st.button("Resume job", key=f"resume_{job_id}"):
+            runner.resume(job_id, api_key)
+    # Partial results: whatever has been scored so far
+    if job["rows"]:
+        import pandas as pd
+
+        preview = pd.DataFrame(list(runner.store.rows(job_id, limit=1000)), columns=BULK_COLUMNS)
+        st.dataframe(preview.sort_values("similarity", ascending=False), use_container_width=True)
+    if job["status"] == "done":
+        download_key = ("bulk_job_download", job_id, export_format, detailed)
+        if st.button("Prepare download", key=f"prepare_{job_id}"):
+            rows = runner.store.rows(job_id)
+            if detailed:
+                from serp_scheduler import load_checkpoint
+
+                serps, _ = load_checkpoint(runner.store.path(job_id, "checkpoint.jsonl"))
+                data = export_bytes(detailed_pair_rows(serps, rows), export_format, COMPARISON_COLUMNS)
+            else:
+                data = export_bytes(rows, export_format, BULK_COLUMNS)
+            st.session_state["bulk_job_download"] = (download_key, data)
+        prepared = st.session_state.get("bulk_job_download")
+        if prepared is not None and prepared[0] == download_key:
+            st.download_button(f"Download {export_format.upper()}", prepared[1], file_name=f"serp_similarity_{job_id}.{export_format}", mime=EXPORT_MIME_TYPES[export_format], key=f"download_{job_id}")
 
 if __name__ == "__main__":
     main()
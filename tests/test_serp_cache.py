@@ -0,0 +1,78 @@
+import serp_cache
+from serp_cache import SerpCache, cache_key
+
+RESULTS = {"organic_results": [{"position": 1, "link": "https://a.com/", "title": "A"}]}
+
+
+def params(keyword, **extra):
+    return dict({"q": keyword, "gl": "us", "hl": "en", "device": "desktop", "num": 20, "api_key": "key"}, **extra)
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def cache_with_clock(monkeypatch, tmp_path, **options):
+    clock = Clock()
+    monkeypatch.setattr(serp_cache.time, "time", clock)
+    return SerpCache(str(tmp_path / "cache.sqlite3"), **options), clock
+
+
+def test_key_ignores_api_key_case_and_spacing():
+    assert cache_key(params("Running  Shoes")) == cache_key(dict(params("running shoes"), api_key="other"))
+    assert cache_key(params("shoes")) != cache_key(params("shoes", start=20))
+    assert cache_key(params("shoes")) == cache_key(params("shoes", start=0))
+
+
+def test_hit_and_miss(monkeypatch, tmp_path):
+    cache, _ = cache_with_clock(monkeypatch, tmp_path)
+    assert cache.get(params("shoes")) is None
+    cache.set(params("shoes"), RESULTS)
+    assert cache.get(params("shoes")) == RESULTS
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "entries": 1}
+
+
+def test_entries_expire_after_the_ttl(monkeypatch, tmp_path):
+    cache, clock = cache_with_clock(monkeypatch, tmp_path, ttl=60)
+    cache.set(params("shoes"), RESULTS)
+    clock.now += 59
+    assert cache.get(params("shoes")) == RESULTS
+    # Reading an entry doesn't extend its life
+    clock.now += 2
+    assert cache.get(params("shoes")) is None
+    assert len(cache) == 0
+
+
+def test_expired_entries_are_dropped_on_write(monkeypatch, tmp_path):
+    cache, clock = cache_with_clock(monkeypatch, tmp_path, ttl=60)
+    cache.set(params("old"), RESULTS)
+    clock.now += 61
+    cache.set(params("new"), RESULTS)
+    assert len(cache) == 1
+
+
+def test_least_recently_used_entries_are_evicted(monkeypatch, tmp_path):
+    cache, clock = cache_with_clock(monkeypatch, tmp_path, ttl=0, max_entries=2)
+    cache.set(params("a"), RESULTS)
+    clock.now += 1
+    cache.set(params("b"), RESULTS)
+    clock.now += 1
+    # Touching "a" makes "b" the least recently used
+    assert cache.get(params("a")) == RESULTS
+    clock.now += 1
+    cache.set(params("c"), RESULTS)
+    assert len(cache) == 2
+    assert cache.get(params("b")) is None
+    assert cache.get(params("a")) == RESULTS and cache.get(params("c")) == RESULTS
+
+
+def test_entries_survive_reopening(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SerpCache(path)
+    cache.set(params("shoes"), RESULTS)
+    cache.close()
+    assert SerpCache(path).get(params("shoes")) == RESULTS
@@ -0,0 +1,45 @@
+from serp_changes import ChangeTracker, diff_serps
+
+
+def test_identical_lists_have_no_events():
+    urls = ["https://a.com/", "https://b.com/"]
+    assert diff_serps(urls, list(urls)) == []
+
+
+def test_new_dropped_and_moved():
+    events = diff_serps(["https://a.com/", "https://b.com/", "https://c.com/"],
+                        ["https://b.com/", "https://a.com/", "https://d.com/"])
+    assert events == [
+        {"type": "moved", "url": "https://b.com/", "rank": 1, "previous_rank": 2},
+        {"type": "moved", "url": "https://a.com/", "rank": 2, "previous_rank": 1},
+        {"type": "new", "url": "https://d.com/", "rank": 3},
+        {"type": "dropped", "url": "https://c.com/", "previous_rank": 3},
+    ]
+
+
+def test_domain_swap_replaces_new_and_dropped():
+    events = diff_serps(["https://a.com/x", "https://b.com/"], ["https://b.com/", "https://www.a.com/y"])
+    assert events == [
+        {"type": "moved", "url": "https://b.com/", "rank": 1, "previous_rank": 2},
+        {"type": "domain_swap", "url": "https://www.a.com/y", "rank": 2, "previous_url": "https://a.com/x",
+         "previous_rank": 1},
+    ]
+
+
+def test_duplicate_urls_count_at_their_best_rank():
+    assert diff_serps(["https://a.com/", "https://a.com/"], ["https://a.com/"]) == []
+
+
+def test_tracker_reports_only_changes(tmp_path):
+    tracker = ChangeTracker(str(tmp_path / "changes.sqlite3"))
+    first = tracker.update("kw", "google.com", "en", "Desktop", ["https://a.com/", "https://b.com/"])
+    assert first == [{"keyword": "kw", "market": "google.com", "language": "en", "device": "Desktop",
+                      "type": "first_seen", "urls": 2}]
+    assert tracker.update("kw", "google.com", "en", "Desktop", ["https://a.com/", "https://b.com/"]) == []
+    moved = tracker.update("kw", "google.com", "en", "Desktop", ["https://b.com/", "https://a.com/"])
+    assert [event["type"] for event in moved] == ["moved", "moved"]
+    tracker.close()
+    # The last list survives a restart
+    tracker = ChangeTracker(str(tmp_path / "changes.sqlite3"))
+    assert tracker.update("kw", "google.com", "en", "Desktop", ["https://b.com/", "https://a.com/"]) == []
+    tracker.close()
@@ -0,0 +1,88 @@
+import serp_clusters
+from serp_clusters import ClusterIndex
+from serp_record import SerpRecord
+
+
+def urls(site, count=10, start=0):
+    return [f"https://{site}.com/{page}" for page in range(start, start + count)]
+
+
+def open_index(tmp_path, min_similarity=30):
+    return ClusterIndex(str(tmp_path / "clusters.sqlite3"), min_similarity)
+
+
+def test_keywords_join_the_cluster_of_a_similar_seed(tmp_path):
+    index = open_index(tmp_path)
+    shoes = index.add("running shoes", urls("shoes"))
+    assert index.add("best running shoes", urls("shoes", start=5)) == shoes
+    other = index.add("pizza", urls("pizza"))
+    assert other != shoes
+    # Shares URLs with the seed, but too few of them
+    assert index.add("shoe laces", urls("shoes", start=8) + urls("laces", count=8)) not in (shoes, other)
+    assert index.assign(urls("nothing")) == (None, 0)
+
+
+def test_only_seeds_sharing_a_url_are_scored(tmp_path, monkeypatch):
+    index = open_index(tmp_path)
+    for site in ("a", "b", "c"):
+        index.add(site, urls(site))
+    scored = []
+    real = serp_clusters.serp_similarity
+    monkeypatch.setattr(serp_clusters, "serp_similarity", lambda a, b: scored.append(b[0]) or real(a, b))
+    index.assign(urls("b", count=5))
+    assert scored == ["https://b.com/0"]
+
+
+def test_removing_a_seed_promotes_the_closest_member(tmp_path):
+    index = open_index(tmp_path)
+    cluster = index.add("seed", urls("shoes"))
+    index.add("close", urls("shoes", start=1))
+    index.add("far", urls("shoes", start=6) + urls("other", count=4))
+    assert index.remove("seed")
+    assert index.clusters[cluster]["seed"] == "close"
+    # The new seed's URLs now route new keywords to the cluster
+    assert index.add("newcomer", urls("shoes", start=9, count=2)) == cluster
+    index.remove("close")
+    index.remove("far")
+    index.remove("newcomer")
+    assert cluster not in index.clusters and not index.postings
+    assert not index.remove("missing")
+
+
+def test_re_adding_a_keyword_moves_it(tmp_path):
+    index = open_index(tmp_path)
+    shoes = index.add("shoes", urls("shoes"))
+    pizza = index.add("pizza", urls("pizza"))
+    index.add("moving", urls("shoes"))
+    assert index.cluster_of("moving") == shoes
+    assert index.add("moving", urls("pizza")) == pizza
+    assert index.clusters[shoes]["members"] == {"shoes"}
+    assert index.clusters[pizza]["members"] == {"pizza", "moving"}
+
+
+def test_index_reloads_from_sqlite(tmp_path):
+    index = open_index(tmp_path)
+    index.add("seed", urls("shoes"))
+    index.add("member", urls("shoes", start=2))
+    index.add("pizza", urls("pizza"))
+    index.remove("seed")
+    rows = list(index.rows())
+    index.close()
+
+    reloaded = open_index(tmp_path)
+    assert list(reloaded.rows()) == rows
+    assert reloaded.postings == index.postings
+    assert reloaded.add("late", urls("shoes", start=3)) == reloaded.cluster_of("member")
+
+
+def test_failed_fetches_are_not_clustered(tmp_path, monkeypatch, capsys):
+    def fetch_keyword_serps(keywords, *args, **kwargs):
+        return {"shoes": SerpRecord(urls("shoes")), "pizza": SerpRecord(error="Invalid API key")}
+
+    keywords = tmp_path / "keywords.txt"
+    keywords.write_text("shoes\npizza\n", encoding="utf-8")
+    monkeypatch.setattr("serp_bulk.fetch_keyword_serps", fetch_keyword_serps)
+    serp_clusters.main(["add", str(keywords), "--db", str(tmp_path / "clusters.sqlite3")])
+    out, err = capsys.readouterr()
+    assert [line.split(",")[2] for line in out.splitlines()[1:]] == ["shoes"]
+    assert "pizza: Invalid API key" in err and "1 of 2 keywords failed" in err
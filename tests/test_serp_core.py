@@ -0,0 +1,49 @@
+import serp_core
+from serp_core import NO_RESULTS_ERROR, build_page_params, compare_urls, merge_pages, serp_similarity
+from serp_matrix import similar_pairs, similarity_matrix
+
+
+def page(*links, error=None):
+    results = {"organic_results": [{"link": link} for link in links]}
+    if error:
+        results["error"] = error
+    return results
+
+
+def test_every_supported_depth_is_one_request():
+    assert build_page_params("kw", "key", "google.com", "en", "Desktop", 10)[0]["num"] == 20
+    for depth in (20, 50, 100):
+        pages = build_page_params("kw", "key", "google.com", "en", "Desktop", depth)
+        assert len(pages) == 1
+        assert pages[0]["num"] == depth and "start" not in pages[0]
+
+
+def test_depth_past_the_page_limit_is_split(monkeypatch):
+    monkeypatch.setattr(serp_core, "MAX_PAGE_SIZE", 50)
+    pages = build_page_params("kw", "key", "google.com", "en", "Desktop", 100)
+    assert [(params["num"], params["start"]) for params in pages] == [(50, 0), (50, 50)]
+
+
+def test_merge_pages_dedupes_in_order():
+    merged = merge_pages([page("https://a.com/", "https://b.com/"), page("https://b.com/", "https://c.com/")])
+    assert merged == page("https://a.com/", "https://b.com/", "https://c.com/")
+
+
+def test_page_past_the_end_is_not_an_error():
+    merged = merge_pages([page("https://a.com/"), page(error=NO_RESULTS_ERROR)])
+    assert merged == page("https://a.com/")
+
+
+def test_later_page_failure_fails_the_serp():
+    merged = merge_pages([page("https://a.com/"), page(error="Request timed out")])
+    assert merged["error"] == "Request timed out"
+    assert merge_pages([page(error="Invalid API key"), page(error="Invalid API key")])["error"] == "Invalid API key"
+
+
+def test_duplicate_urls_count_once_everywhere():
+    a, b = "https://a.com/", "https://b.com/"
+    assert serp_similarity([a, a, b], [a]) == 50.0
+    assert serp_similarity([a], [a, a, b]) == 100.0
+    assert list(similar_pairs([[a, a, b], [a]])) == [(0, 1, 50.0, 1)]
+    assert similarity_matrix([[a, a, b], [a]]).toarray().tolist() == [[100.0, 50.0], [100.0, 100.0]]
+    assert compare_urls([a, a, b], [a])["exact_matches"] == [a]
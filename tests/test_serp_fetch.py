@@ -0,0 +1,171 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from serp_fetch import SerpFetcher, SingleFlight
+from serp_replay import StandinServer
+from serp_scheduler import CreditBudget
+
+
+def params(keyword):
+    return {"engine": "google", "q": keyword, "gl": "us", "hl": "en", "num": 20, "api_key": "key",
+            "device": "desktop"}
+
+
+def fetcher_for(server, **options):
+    return SerpFetcher(base_url=server.url, backoff=0, slim=True, **options)
+
+
+def test_retryable_failures_are_retried():
+    with StandinServer(error_rate=0.5, seed=3) as server:
+        fetcher = fetcher_for(server, max_retries=10)
+        results = fetcher.fetch_many([params(f"shoes {index}") for index in range(20)])
+        fetcher.close()
+    assert all("error" not in result and result["organic_results"] for result in results)
+    assert server.errors > 0
+    assert server.requests == 20 + server.errors
+    assert fetcher.credits == 20
+
+
+def test_exhausted_retries_return_the_error_and_refund_the_credit():
+    budget = CreditBudget(5)
+    with StandinServer(error_rate=1.0) as server:
+        fetcher = fetcher_for(server, max_retries=2, budget=budget)
+        results = fetcher.fetch(params("shoes"))
+        fetcher.close()
+    assert results["error"] == "Stand-in injected failure"
+    assert server.requests == 3
+    assert budget.spent == 0 and fetcher.credits == 0
+
+
+@pytest.mark.parametrize("error", [requests.exceptions.ChunkedEncodingError, requests.exceptions.ContentDecodingError,
+                                   requests.exceptions.TooManyRedirects])
+def test_any_requests_failure_is_retried_then_returned(monkeypatch, error):
+    budget = CreditBudget(5)
+    with StandinServer() as server:
+        fetcher = fetcher_for(server, max_retries=2, budget=budget)
+        calls = []
+
+        def get(*args, **kwargs):
+            calls.append(1)
+            raise error("connection broken")
+
+        monkeypatch.setattr(fetcher.session, "get", get)
+        results = fetcher.fetch(params("shoes"))
+        fetcher.close()
+    assert results == {"error": "connection broken"}
+    assert len(calls) == 3
+    assert budget.spent == 0
+
+
+def test_a_credit_is_refunded_when_the_request_raises(monkeypatch):
+    budget = CreditBudget(5)
+    with StandinServer() as server:
+        fetcher = fetcher_for(server, budget=budget)
+        monkeypatch.setattr(fetcher, "_request", lambda params: 1 / 0)
+        with pytest.raises(ZeroDivisionError):
+            fetcher.fetch(params("shoes"))
+        fetcher.close()
+    assert budget.spent == 0
+
+
+def run_followers(flight, key, fn, count):
+    # Starts a leader that blocks until released, then followers for the same key
+    release = threading.Event()
+    outcomes = []
+
+    def call(fn):
+        try:
+            outcomes.append(flight.do(key, fn))
+        except Exception as e:
+            outcomes.append(e)
+
+    leader = threading.Thread(target=call, args=(lambda: (release.wait(), fn())[1],))
+    leader.start()
+    while not len(flight):
+        time.sleep(0.001)
+    followers = [threading.Thread(target=call, args=(lambda: pytest.fail("follower ran its own call"),))
+                 for _ in range(count)]
+    for thread in followers:
+        thread.start()
+    # Give the followers time to join the call in flight before it finishes
+    time.sleep(0.1)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join()
+    return outcomes
+
+
+def test_single_flight_followers_get_the_leaders_result():
+    flight = SingleFlight()
+    outcomes = run_followers(flight, "shoes", lambda: {"organic_results": []}, 3)
+    assert sorted(shared for _, shared in outcomes) == [False, True, True, True]
+    assert all(result == {"organic_results": []} for result, _ in outcomes)
+    assert len(flight) == 0
+
+
+def test_single_flight_errors_reach_every_caller():
+    flight = SingleFlight()
+    outcomes = run_followers(flight, "shoes", lambda: 1 / 0, 3)
+    assert len(outcomes) == 4 and all(isinstance(outcome, ZeroDivisionError) for outcome in outcomes)
+    # The failed call isn't remembered, so the next one runs again
+    assert flight.do("shoes", lambda: "ok") == ("ok", False)
+
+
+def test_fetchers_share_one_request_per_query(monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def request(params):
+        calls.append(params["api_key"])
+        release.wait()
+        return {"organic_results": [{"link": "https://a.com/"}]}
+
+    fetchers = [SerpFetcher(base_url="http://standin.test/", backoff=0) for _ in range(2)]
+    for fetcher in fetchers:
+        monkeypatch.setattr(fetcher, "_request", request)
+    results = []
+    threads = [threading.Thread(target=lambda fetcher=fetcher: results.append(fetcher.fetch(params("shoes"))))
+               for fetcher in fetchers]
+    threads[0].start()
+    while not calls:
+        time.sleep(0.001)
+    threads[1].start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert calls == ["key"]
+    assert results[0] == results[1] == {"organic_results": [{"link": "https://a.com/"}]}
+
+
+def test_a_failure_under_another_api_key_is_retried_with_ours(monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def request(params):
+        calls.append(params["api_key"])
+        if params["api_key"] == "bad":
+            release.wait()
+            return {"error": "Invalid API key."}
+        return {"organic_results": [{"link": "https://a.com/"}]}
+
+    bad, good = SerpFetcher(backoff=0), SerpFetcher(backoff=0)
+    monkeypatch.setattr(bad, "_request", request)
+    monkeypatch.setattr(good, "_request", request)
+    results = {}
+    threads = [threading.Thread(target=lambda: results.update(bad=bad.fetch(dict(params("shoes"), api_key="bad")))),
+               threading.Thread(target=lambda: results.update(good=good.fetch(dict(params("shoes"), api_key="good"))))]
+    threads[0].start()
+    while not calls:
+        time.sleep(0.001)
+    threads[1].start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert calls == ["bad", "good"]
+    assert results["bad"] == {"error": "Invalid API key."}
+    assert results["good"] == {"organic_results": [{"link": "https://a.com/"}]}
@@ -0,0 +1,60 @@
+import datetime
+import os
+
+from serp_history import SnapshotStore
+
+FETCHED_AT = datetime.datetime.now(datetime.timezone.utc)
+DATE = FETCHED_AT.date().isoformat()
+
+
+def serp(*links):
+    return {"organic_results": [{"position": rank, "link": link, "title": link}
+                                for rank, link in enumerate(links, start=1)]}
+
+
+def record(store, keyword, *links):
+    store.record({"q": keyword, "gl": "us", "hl": "en", "device": "desktop"}, serp(*links), FETCHED_AT)
+
+
+def parts(store):
+    return sorted(os.listdir(os.path.join(store.root, f"date={DATE}")))
+
+
+def test_record_and_query(tmp_path):
+    store = SnapshotStore(str(tmp_path), flush_rows=1)
+    record(store, "kw", "https://a.com/", "https://b.com/")
+    record(store, "other", "https://a.com/")
+    assert [(row["rank"], row["url"]) for row in store.keyword_history("kw")] == [
+        (1, "https://a.com/"), (2, "https://b.com/")]
+    assert {row["keyword"] for row in store.rank_history("https://a.com/")} == {"kw", "other"}
+    assert store.query(["keyword"], keyword="missing") == []
+
+
+def test_errors_are_not_recorded(tmp_path):
+    store = SnapshotStore(str(tmp_path / "history"), flush_rows=1)
+    store.record({"q": "kw"}, {"error": "Invalid API key"}, FETCHED_AT)
+    assert store.query(["keyword"]) == []
+
+
+def test_buffered_rows_are_flushed_before_a_query(tmp_path):
+    store = SnapshotStore(str(tmp_path), flush_rows=1000)
+    record(store, "kw", "https://a.com/")
+    assert not os.path.exists(os.path.join(store.root, f"date={DATE}"))
+    assert len(store.keyword_history("kw")) == 1
+
+
+def test_compact_then_query(tmp_path):
+    store = SnapshotStore(str(tmp_path), flush_rows=1)
+    record(store, "kw", "https://a.com/", "https://b.com/")
+    record(store, "kw", "https://b.com/", "https://a.com/")
+    assert len(parts(store)) == 2
+    store.compact(DATE)
+    assert len(parts(store)) == 1
+    rows = store.keyword_history("kw")
+    assert len(rows) == 4
+    assert {row["date"] for row in rows} == {DATE}
+    # Compacting again and adding to the compacted day keep the schema readable
+    record(store, "kw", "https://c.com/")
+    store.compact(DATE)
+    assert len(parts(store)) == 1
+    assert len(store.keyword_history("kw")) == 5
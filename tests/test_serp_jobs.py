@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+import serp_scheduler
+from serp_jobs import JobRunner, JobStore, is_resumable
+from serp_record import SerpRecord
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_mark_interrupted_only_touches_stale_jobs_of_this_host(tmp_path):
+    store = JobStore(str(tmp_path))
+    own = store.create("bulk", {})
+    dead = store.create("bulk", {})
+    live = store.create("bulk", {})
+    remote = store.create("bulk", {})
+    done = store.create("bulk", {})
+    store.update(dead, status="running", pid=dead_pid())
+    # The test runner's parent stands in for another live app process sharing the directory
+    store.update(live, status="running", pid=os.getppid())
+    store.update(remote, status="running", host="another-host", pid=dead_pid())
+    store.update(done, status="done", pid=dead_pid())
+
+    assert sorted(store.mark_interrupted()) == sorted([own, dead])
+    statuses = {job_id: store.get(job_id)["status"] for job_id in (own, dead, live, remote, done)}
+    assert statuses == {own: "interrupted", dead: "interrupted", live: "running", remote: "running", done: "done"}
+
+
+def test_job_tables_without_owner_columns_are_upgraded(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "jobs.sqlite3"))
+    conn.execute(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, stage TEXT NOT NULL, "
+        "params TEXT NOT NULL, total INTEGER NOT NULL DEFAULT 0, fetched INTEGER NOT NULL DEFAULT 0, "
+        "failed INTEGER NOT NULL DEFAULT 0, rows INTEGER NOT NULL DEFAULT 0, message TEXT NOT NULL DEFAULT '', "
+        "created_at REAL NOT NULL, updated_at REAL NOT NULL)")
+    conn.execute("INSERT INTO jobs (id, kind, status, stage, params, created_at, updated_at) "
+                 "VALUES ('old', 'bulk', 'running', 'fetch', '{}', 0, 0)")
+    conn.commit()
+    conn.close()
+
+    store = JobStore(str(tmp_path))
+    # A job from before owners were recorded can't be running any more
+    assert store.mark_interrupted() == ["old"]
+    assert store.get("old")["pid"] == 0
+
+
+class FakeScheduler:
+    def __init__(self, failed):
+        self.failed = failed
+        self.pending = 0
+        self.budget_exhausted = False
+
+
+def wait_for(store, job_id, status):
+    deadline = time.monotonic() + 10
+    while store.get(job_id)["status"] != status and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return store.get(job_id)
+
+
+def test_a_job_whose_keywords_all_failed_can_be_resumed(tmp_path, monkeypatch):
+    runs = []
+
+    def run_job(keywords, api_key, *args, **kwargs):
+        runs.append(api_key)
+        if api_key == "bad":
+            return {}, FakeScheduler({keyword: "Invalid API key." for keyword in keywords})
+        serps = {keyword: SerpRecord(urls=["https://a.com/", f"https://{keyword}.com/"]) for keyword in keywords}
+        return serps, FakeScheduler({})
+
+    monkeypatch.setattr(serp_scheduler, "run_job", run_job)
+    store = JobStore(str(tmp_path))
+    runner = JobRunner(store)
+    job_id = runner.submit_bulk(["shoes", "boots"], "bad", "google.com", "en", "Desktop")
+    job = wait_for(store, job_id, "failed")
+    assert job["failed"] == 2 and job["message"] == "All 2 keywords failed: Invalid API key."
+
+    assert runner.resume(job_id, "good")
+    job = wait_for(store, job_id, "done")
+    assert job["failed"] == 0 and job["rows"] == 1
+    assert runs == ["bad", "good"]
+    assert not runner.resume(job_id, "good")
+
+
+def test_finished_jobs_with_failed_keywords_are_resumable():
+    assert is_resumable({"status": "done", "failed": 3})
+    assert not is_resumable({"status": "done", "failed": 0})
+    assert not is_resumable({"status": "running", "failed": 3})
@@ -0,0 +1,76 @@
+import itertools
+import random
+
+from serp_bulk import approximate_pairs
+from serp_lsh import MinHashLSH, build_index, recall_report, sampled_recall_report
+from serp_matrix import similar_pairs
+
+
+def clustered_lists(clusters=40, per_cluster=5, seed=0):
+    # Keywords in one cluster share most of their URLs, across clusters almost none
+    rng = random.Random(seed)
+    lists = []
+    for cluster in range(clusters):
+        core = [f"https://c{cluster}.com/{page}" for page in range(10)]
+        for member in range(per_cluster):
+            swapped = rng.randint(0, 4)
+            urls = core[:10 - swapped] + [f"https://other{rng.randrange(10_000)}.com/" for _ in range(swapped)]
+            rng.shuffle(urls)
+            lists.append(urls)
+    return lists
+
+
+def test_recall_reaches_target():
+    lists = clustered_lists()
+    report = recall_report(lists, build_index(lists, threshold=50, target_recall=0.95))
+    assert report["exact_pairs"] > 100
+    assert report["recall"] >= 0.9
+    assert report["expected_recall"] >= 0.95
+
+
+def test_sampled_recall_report_uses_a_sample():
+    lists = clustered_lists()
+    report = sampled_recall_report(lists, threshold=50, sample_size=100)
+    assert report["keywords"] == 100
+    assert 0 <= report["recall"] <= 1
+
+
+def test_re_adding_a_key_replaces_its_entry():
+    index = MinHashLSH(threshold=50)
+    urls = [f"https://a.com/{page}" for page in range(10)]
+    other = [f"https://b.com/{page}" for page in range(10)]
+    index.add_many([("kw", other), ("kw", urls)])
+    index.add("twin", urls)
+    index.add("kw", urls)
+    assert len(index) == 2
+    assert index.candidate_pairs() == {("twin", "kw")}
+    assert [key for key, _ in index.query(urls)] == ["twin", "kw"]
+    assert index.query(other) == []
+    # Re-adding with an empty SERP drops the key
+    index.add("kw", [])
+    assert [key for key, _ in index.query(urls)] == ["twin"]
+
+
+def test_candidate_pairs_are_the_keys_sharing_a_band():
+    # Low thresholds give one-row bands and long runs of equal band hashes
+    lists = clustered_lists(clusters=10)
+    lists[3] = []
+    index = build_index(lists, threshold=30)
+    index.remove(7)
+    band_hashes = index.band_hashes(index._signatures)
+    expected = set()
+    for row1, row2 in itertools.combinations(range(len(index.keys)), 2):
+        if index._alive[row1] and index._alive[row2] and (band_hashes[row1] == band_hashes[row2]).any():
+            expected.add((index.keys[row1], index.keys[row2]))
+    assert index.rows == 1 and expected
+    assert index.candidate_pairs() == expected
+
+
+def test_approximate_pairs_are_exact_scores_of_the_candidates():
+    lists = clustered_lists()
+    lists[5] = []
+    exact = list(similar_pairs(lists, 40))
+    approximate = list(approximate_pairs(lists, 40))
+    assert set(approximate) <= set(exact)
+    assert len(approximate) >= 0.9 * len(exact)
+    assert approximate == sorted(approximate)
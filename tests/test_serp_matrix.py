@@ -0,0 +1,50 @@
+import itertools
+import random
+
+import numpy as np
+
+import serp_matrix
+from serp_bulk import with_unshared_pairs
+from serp_core import serp_similarity
+from serp_matrix import score_pairs, similar_pairs
+
+
+def url_lists(count=60, seed=0):
+    rng = random.Random(seed)
+    pool = [f"https://site{site}.com/{page}" for site in range(30) for page in range(2)]
+    return [rng.sample(pool, 10) for _ in range(count)]
+
+
+def test_similar_pairs_match_pairwise_scores(monkeypatch):
+    # Several row blocks, so pairs crossing a block boundary are covered
+    monkeypatch.setattr(serp_matrix, "PAIR_BLOCK_ROWS", 7)
+    lists = url_lists()
+    expected = []
+    for i, j in itertools.combinations(range(len(lists)), 2):
+        shared = len(set(lists[i]) & set(lists[j]))
+        if shared:
+            expected.append((i, j, serp_similarity(lists[i], lists[j]), shared))
+    assert list(similar_pairs(lists)) == expected
+    assert list(similar_pairs(lists, min_similarity=30)) == [pair for pair in expected if pair[2] >= 30]
+
+
+def test_block_size_does_not_change_weighted_pairs(monkeypatch):
+    lists = url_lists()
+    whole = list(similar_pairs(lists, rank_weighted=True))
+    monkeypatch.setattr(serp_matrix, "PAIR_BLOCK_ROWS", 5)
+    assert list(similar_pairs(lists, rank_weighted=True)) == whole
+    # Weighted scores still report the plain number of shared URLs
+    assert all(shared == len(set(lists[i]) & set(lists[j])) for i, j, _, shared in whole)
+
+
+def test_with_unshared_pairs_fills_zeros_in_order():
+    pairs = list(with_unshared_pairs(iter([(0, 2, 50.0, 1), (1, 3, 10.0, 1)]), 4))
+    assert pairs == [(0, 1, 0, 0), (0, 2, 50.0, 1), (0, 3, 0, 0), (1, 2, 0, 0), (1, 3, 10.0, 1), (2, 3, 0, 0)]
+
+
+def test_score_pairs_match_similar_pairs(monkeypatch):
+    monkeypatch.setattr(serp_matrix, "SCORE_BLOCK_PAIRS", 5)
+    lists = url_lists()
+    lists[4] = []
+    firsts, seconds = np.array(list(itertools.combinations(range(len(lists)), 2))).T
+    assert list(score_pairs(lists, firsts, seconds, 30)) == list(similar_pairs(lists, 30))
@@ -0,0 +1,28 @@
+from collections import Counter
+
+from serp_ngrams import NgramCounter, TopK
+
+
+def test_topk_is_exact_until_it_prunes():
+    sketch = TopK(capacity=2)
+    sketch.update(["a", "a", "b", "c"])
+    assert sketch.exact and sketch["a"] == 2
+    sketch.update(["d", "e"])
+    assert not sketch.exact
+    # Pruning only ever lowers counts
+    assert sketch["a"] <= 2
+
+
+def test_merging_an_approximate_sketch_is_approximate():
+    exact, pruned = TopK(capacity=2), TopK(capacity=2)
+    exact.update(["a"])
+    pruned.update(["a", "b", "c", "d", "e"])
+    assert not exact.merge(pruned).exact
+
+
+def test_counter_matches_exact_counts_when_the_vocabulary_fits():
+    titles = ["Best Running Shoes", "best running shoes for women", "Trail running shoes"]
+    exact = NgramCounter().update(titles).counts()
+    sketched = NgramCounter(top_k=100).update(titles).counts()
+    for counter, sketch in zip(exact, sketched):
+        assert sketch.exact and Counter(dict(sketch.most_common())) == counter
@@ -0,0 +1,51 @@
+import json
+import pickle
+
+from serp_record import SerpRecord, UrlTable, from_results, parse_payload
+
+ORGANIC = [{"position": 1, "link": "https://a.com/", "title": "A", "snippet": "dropped"},
+           {"position": 2, "link": "https://b.com/", "title": "B"}]
+
+
+def test_parse_payload_keeps_only_organic_fields():
+    text = json.dumps({"search_metadata": {"id": "1"}, "organic_results": ORGANIC, "pagination": {}})
+    assert parse_payload(text) == {"organic_results": [{"position": 1, "link": "https://a.com/", "title": "A"},
+                                                       {"position": 2, "link": "https://b.com/", "title": "B"}]}
+
+
+def test_parse_payload_ignores_nested_organic_results():
+    nested = [{"position": 1, "link": "https://nested.com/", "title": "Nested"}]
+    text = json.dumps({"search_parameters": {"organic_results": nested}, "ads": [{"title": '"organic_results": []'}],
+                       "organic_results": ORGANIC})
+    assert [result["link"] for result in parse_payload(text)["organic_results"]] == ["https://a.com/",
+                                                                                    "https://b.com/"]
+    # Without a top-level key there are no organic results, whatever is nested
+    text = json.dumps({"inline": {"organic_results": nested}})
+    assert parse_payload(text) == {"organic_results": []}
+
+
+def test_parse_payload_handles_whitespace_and_errors():
+    text = json.dumps({"search_metadata": {"id": "1"}, "organic_results": ORGANIC}, indent=2)
+    assert len(parse_payload(text)["organic_results"]) == 2
+    assert parse_payload(json.dumps({"error": "Invalid API key"})) == {"organic_results": [], "error": "Invalid API key"}
+
+
+def test_records_of_a_batch_share_a_table():
+    table = UrlTable()
+    first = from_results({"organic_results": ORGANIC}, table=table)
+    second = from_results({"organic_results": ORGANIC[::-1]}, table=table)
+    assert len(table) == 2
+    assert list(second.url_ids) == list(first.url_ids)[::-1]
+    # A record made on its own doesn't add to anyone else's table
+    alone = SerpRecord(["https://c.com/"])
+    assert len(table) == 2 and alone.urls == ["https://c.com/"]
+
+
+def test_pickled_record_carries_only_its_urls():
+    table = UrlTable()
+    for index in range(100):
+        table.intern(f"https://site{index}.com/")
+    record = SerpRecord(["https://a.com/", "https://b.com/"], titles=["A", "B"], table=table)
+    copy = pickle.loads(pickle.dumps(record))
+    assert copy == record
+    assert len(copy.table) == 2
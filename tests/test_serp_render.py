@@ -0,0 +1,55 @@
+from collections import Counter
+
+from serp_core import compare_urls
+from serp_ngrams import TopK
+from serp_render import page_count, render_ngram_table, render_table
+
+
+def test_ngram_table_marks_pruned_counts_as_lower_bounds():
+    pruned = TopK(capacity=1)
+    pruned.update(["a", "a", "b", "c"])
+    html = render_ngram_table(Counter({"a": 2}), pruned, Counter())
+    assert html.count("<th>Frequency</th>") == 2
+    assert html.count("<th>Frequency (at least)</th>") == 1
+
+
+def row_numbers(html):
+    return [int(cell.split("<")[0]) for cell in html.split('<td class="numbering">')[1:]]
+
+
+def test_table_renders_one_page_with_continued_numbering():
+    urls1 = [f"https://a{rank}.com/" for rank in range(1, 51)]
+    urls2 = [f"https://b{rank}.com/" for rank in range(1, 51)]
+    comparison = compare_urls(urls1, urls2)
+    assert page_count(urls1, urls2) == 3
+    assert row_numbers(render_table("one", "two", urls1, urls2, comparison)) == list(range(1, 21))
+    second = render_table("one", "two", urls1, urls2, comparison, page=1)
+    assert row_numbers(second) == list(range(21, 41))
+    assert "https://a21.com/" in second and "https://a20.com/" not in second
+    assert row_numbers(render_table("one", "two", urls1, urls2, comparison, page=2)) == list(range(41, 51))
+
+
+def test_page_count_follows_the_shorter_list():
+    assert page_count(["u"] * 45, ["u"] * 15, page_size=10) == 2
+    assert page_count([], []) == 1
+
+
+def test_keywords_and_urls_are_escaped():
+    urls = ['https://a.com/?q=<script>&x="1"', "https://b.com/"]
+    html = render_table("<b>one</b>", "two & three", urls, urls[::-1], compare_urls(urls, urls[::-1]))
+    assert "<script>" not in html and "<b>one</b>" not in html
+    assert "&lt;b&gt;one&lt;/b&gt;" in html and "two &amp; three" in html
+    assert "https://a.com/?q=&lt;script&gt;&amp;x=&quot;1&quot;" in html
+
+
+def test_exact_matches_keep_their_color_on_every_page():
+    shared = "https://shared.com/"
+    urls1 = [shared] + [f"https://a{rank}.com/" for rank in range(2, 41)]
+    urls2 = [f"https://b{rank}.com/" for rank in range(1, 41)]
+    urls2[24] = shared
+    comparison = compare_urls(urls1, urls2)
+    first = render_table("one", "two", urls1, urls2, comparison, page=0)
+    second = render_table("one", "two", urls1, urls2, comparison, page=1)
+    marker = f'data-url="{shared}"'
+    color = first.split(marker)[0].rsplit("background-color: ", 1)[1].split(";")[0]
+    assert marker in second and f"background-color: {color}; color: black;\" {marker}" in second
@@ -0,0 +1,71 @@
+import json
+
+from serp_fetch import SerpFetcher
+from serp_replay import StandinServer
+from serp_scheduler import KeywordScheduler, load_checkpoint
+
+
+def run(server, checkpoint, keywords):
+    fetcher = SerpFetcher(base_url=server.url, max_workers=2, slim=True)
+    scheduler = KeywordScheduler(fetcher, "key", "google.com", "en", "Desktop", checkpoint=str(checkpoint))
+    for keyword in keywords:
+        scheduler.submit(keyword)
+    try:
+        return scheduler.run()
+    finally:
+        fetcher.close()
+
+
+def test_checkpoint_records_credits_without_a_budget(tmp_path):
+    checkpoint = tmp_path / "job.jsonl"
+    with StandinServer() as server:
+        run(server, checkpoint, ["shoes cheap", "shoes best"])
+        done, spent = load_checkpoint(str(checkpoint))
+        assert sorted(done) == ["shoes best", "shoes cheap"]
+        assert spent == 2
+        # A resumed run carries the count on
+        run(server, checkpoint, ["shoes cheap", "shoes best", "shoes red"])
+    assert load_checkpoint(str(checkpoint))[1] == 3
+
+
+def test_a_line_cut_off_by_a_crash_is_skipped_and_the_next_run_starts_a_new_line(tmp_path):
+    checkpoint = tmp_path / "job.jsonl"
+    with StandinServer() as server:
+        run(server, checkpoint, ["shoes cheap"])
+        with open(checkpoint, "ab") as f:
+            f.write('{"keyword": "shoes bést", "ur'.encode("utf-8"))
+        assert sorted(load_checkpoint(str(checkpoint))[0]) == ["shoes cheap"]
+        done = run(server, checkpoint, ["shoes cheap", "shoes bést"])
+    assert sorted(done) == ["shoes bést", "shoes cheap"]
+    lines = checkpoint.read_bytes().split(b"\n")
+    assert [json.loads(line)["keyword"] for line in lines if line.endswith(b"}")] == ["shoes cheap", "shoes bést"]
+
+
+class RaisingFetcher:
+    # Answers with one synthetic SERP per page, except for one keyword whose fetch raises
+    budget = None
+    credits = 0
+    max_workers = 2
+
+    def __init__(self, failing):
+        self.failing = failing
+
+    def fetch_many(self, pages, force_refresh=False):
+        from serp_replay import synthetic_serp
+
+        if pages[0]["q"] == self.failing:
+            raise ConnectionResetError("connection reset by peer")
+        return [synthetic_serp(params) for params in pages]
+
+
+def test_a_raising_fetch_fails_only_its_keyword(tmp_path):
+    checkpoint = tmp_path / "job.jsonl"
+    scheduler = KeywordScheduler(RaisingFetcher("b"), "key", "google.com", "en", "Desktop",
+                                 checkpoint=str(checkpoint))
+    for keyword in "abcd":
+        scheduler.submit(keyword)
+    done = scheduler.run()
+    assert sorted(done) == ["a", "c", "d"]
+    assert scheduler.failed == {"b": "ConnectionResetError: connection reset by peer"}
+    assert scheduler.pending == 0
+    assert sorted(load_checkpoint(str(checkpoint))[0]) == ["a", "c", "d"]